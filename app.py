@@ -1,8 +1,12 @@
 import dash
 import dash_bootstrap_components as dbc
+from utils.tiles import register_tile_routes
 
 app = dash.Dash(__name__, 
                 external_stylesheets=[dbc.themes.BOOTSTRAP, '/assets/css/styles.css'], 
                 external_scripts=['/assets/js/screen_size.js'],
                 meta_tags=[{"name": "viewport", "content": "width=device-width"}],
                 suppress_callback_exceptions=True)
+
+# Serve the cached map tiles from the Flask server
+register_tile_routes(app.server)
@@ -7,6 +7,7 @@ def Navbar():
         dbc.NavbarSimple(
             children=[
                 dbc.NavItem(dbc.NavLink("Overview", href="/overview")),
+                dbc.NavItem(dbc.NavLink("Live", href="/live")),
                 dbc.NavItem(dbc.NavLink("Settings", href="/settings")),
                 dbc.NavItem(dbc.NavLink("About", href="/about")),
             ],
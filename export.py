@@ -0,0 +1,132 @@
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import plotly.offline
+
+from utils.splits import calculate_efforts
+from utils.tiles import tile_layout, tile_upstream
+from utils.track_cache import load_or_create_track
+from utils.tracks import load_data, create_map_figure, create_combined_figure, format_time
+
+# Batch export of activity summaries, usage: python export.py [GPX files] --output export --formats html png csv
+
+EXPORT_FORMATS = ['html', 'png', 'csv', 'parquet']
+
+# Same default data folder as the overview page
+gpx_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+summary_template = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{name}</title>
+<script src="../plotly.min.js"></script>
+</head>
+<body style="font-family: sans-serif">
+<h1>{name}</h1>
+{metrics}
+{profile}
+{map}
+<h2>Splits</h2>
+{splits}
+</body>
+</html>
+"""
+
+def export_track(file_path, output_folder, formats):
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    track_folder = os.path.join(output_folder, name)
+    os.makedirs(track_folder, exist_ok=True)
+
+    # Reuse the parsed track from the shared cache of the app
+    data = load_or_create_track(file_path, load_data)
+    metrics = dict(data['metrics'], name=name, total_time=format_time(data['metrics']['total_time_seconds']))
+
+    if 'html' in formats or 'png' in formats:
+        # Static files are opened without the app, so the tiles are loaded from the upstream server
+        map_fig = create_map_figure(data, tile_layout(tile_upstream))
+        combined_fig = create_combined_figure(data)
+
+    if 'html' in formats:
+        splits = pd.DataFrame(calculate_efforts(data)['splits'])
+        if not splits.empty:
+            splits['time'] = splits['time'].map(format_time)
+        summary = summary_template.format(
+            name=name,
+            metrics=pd.DataFrame([metrics]).T.to_html(header=False),
+            profile=combined_fig.to_html(full_html=False, include_plotlyjs=False, default_height='500px'),
+            map=map_fig.to_html(full_html=False, include_plotlyjs=False, default_height='500px'),
+            splits=splits.to_html(index=False, float_format='%.2f'),
+        )
+        with open(os.path.join(track_folder, 'summary.html'), 'w') as summary_file:
+            summary_file.write(summary)
+
+    if 'png' in formats:
+        map_fig.write_image(os.path.join(track_folder, 'map.png'), width=1200, height=800)
+        combined_fig.write_image(os.path.join(track_folder, 'profile.png'), width=1200, height=600)
+
+    if 'csv' in formats or 'parquet' in formats:
+        points = pd.DataFrame({
+            'latitude': data['latitudes'],
+            'longitude': data['longitudes'],
+            'time': data['times'],
+            'elevation': data['elevations'],
+        })
+        segments = pd.DataFrame({
+            'distance_kilometers': data['distances_kilometers'],
+            'elapsed_seconds': data['elapsed_seconds'],
+            'smoothed_speed': data['smoothed_speeds'],
+        })
+        tables = {'points': points, 'segments': segments, 'metrics': pd.DataFrame([metrics])}
+        for table_name, table in tables.items():
+            if 'csv' in formats:
+                table.to_csv(os.path.join(track_folder, f'{table_name}.csv'), index=False)
+            if 'parquet' in formats:
+                table.to_parquet(os.path.join(track_folder, f'{table_name}.parquet'), index=False)
+
+    return metrics
+
+def export_tracks(file_paths, output_folder, formats, workers=None):
+    os.makedirs(output_folder, exist_ok=True)
+    if 'html' in formats:
+        # One shared copy of plotly.js so the summaries also open offline
+        with open(os.path.join(output_folder, 'plotly.min.js'), 'w') as plotly_file:
+            plotly_file.write(plotly.offline.get_plotlyjs())
+
+    # Every activity is exported in its own process to use all cores
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {file_path: executor.submit(export_track, file_path, output_folder, formats) for file_path in file_paths}
+        summaries = []
+        for file_path, future in futures.items():
+            try:
+                summaries.append(future.result())
+            except Exception as error:
+                print(f"Export of '{os.path.basename(file_path)}' failed: {error}")
+
+    if summaries:
+        pd.DataFrame(summaries).to_csv(os.path.join(output_folder, 'summary.csv'), index=False)
+    return summaries
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export activity summaries as static HTML, PNG, CSV and Parquet files.')
+    parser.add_argument('files', nargs='*', help='GPX files to export, all files in the data folder by default')
+    parser.add_argument('--output', default='export', help='output folder')
+    parser.add_argument('--formats', nargs='+', choices=EXPORT_FORMATS, default=['html', 'csv'], help='export formats')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes, all cores by default')
+    args = parser.parse_args()
+
+    # PNG and Parquet need optional packages that are not required by the app itself
+    try:
+        if 'png' in args.formats:
+            import kaleido
+        if 'parquet' in args.formats:
+            import pyarrow
+    except ImportError as error:
+        parser.error(f"{error.name} is required for this export format, install it with 'pip install {error.name}'")
+
+    file_paths = [os.path.abspath(file_path) for file_path in args.files] or sorted(glob.glob(os.path.join(gpx_folder, '*.gpx')))
+    summaries = export_tracks(file_paths, args.output, args.formats, args.workers)
+    print(f"Exported {len(summaries)} of {len(file_paths)} activities to '{args.output}'")
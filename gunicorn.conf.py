@@ -0,0 +1,10 @@
+import multiprocessing
+import os
+
+# Gunicorn settings for the multi-worker deployment
+bind = os.environ.get('BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('THREADS', 2))
+timeout = 120
+# Import the app once before forking so the workers share its memory
+preload_app = True
@@ -1,9 +1,11 @@
+import uuid
+import dash
 from dash import html, dcc
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
 # Connect to main app.py file
 from app import app
 # Connect to app pages
-from pages import overview, about, settings
+from pages import overview, about, settings, live
 # Connect the navbar to the index
 from components import navbar
 # Make a server
@@ -12,20 +14,29 @@ server = app.server
 nav = navbar.Navbar()
 # Define the index page layout
 app.layout = html.Div([
-    dcc.Store(id='store_weight', storage_type='local', data='weight_value'),
-    dcc.Store(id='store_height', storage_type='local', data='height_value'),
-    dcc.Store(id='store_age', storage_type='local', data='age_value'),
-    dcc.Store(id='store_sex', storage_type='local', data='sex_value'),
+    dcc.Store(id='store_session', storage_type='local'),
+    dcc.Store(id='store_profile', storage_type='local'),
     dcc.Location(id='url', refresh=False),
     nav, 
     html.Div(id='page-content', children=[]), 
 ])
 
+# Give every browser a session id under which its profile is stored on the server
+@app.callback(Output('store_session', 'data'),
+              [Input('url', 'pathname')],
+              [State('store_session', 'data')])
+def init_session(pathname, session_id):
+    if session_id:
+        return dash.no_update
+    return uuid.uuid4().hex
+
 @app.callback(Output('page-content', 'children'),
               [Input('url', 'pathname')])
 def display_page(pathname):
     if pathname == '/overview':
         return overview.layout
+    if pathname == '/live':
+        return live.layout
     if pathname == '/settings':
         return settings.layout
     if pathname == '/about':
@@ -0,0 +1,228 @@
+import dash
+from dash import Input, Output, State
+from dash import dcc, html
+import plotly.graph_objects as go
+import dash_bootstrap_components as dbc
+import os
+import glob
+from flask import request, jsonify
+from app import app
+from plotly.subplots import make_subplots
+from utils.live import live_tracks, get_live_track, follow_gpx, parse_time
+from utils.tiles import tile_layout
+from utils.tracks import format_time
+
+dash.register_page(__name__, path='/live')
+
+# Folder with GPX files that are still being recorded
+live_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)).replace('pages', 'data'), 'live')
+
+# Receive track points from a tracking device, either a single point or a list of points
+@app.server.route('/live/<track_id>/points', methods=['POST'])
+def receive_points(track_id):
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return jsonify({'error': 'Expected a JSON point or list of points'}), 400
+    points = payload if isinstance(payload, list) else [payload]
+
+    # Validate the whole payload first, so an invalid point never leaves the track half updated
+    parsed_points = []
+    for point in points:
+        try:
+            elevation = point.get('ele')
+            parsed_points.append((
+                float(point['lat']),
+                float(point['lon']),
+                parse_time(point['time']),
+                float(elevation) if elevation is not None else None,
+            ))
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return jsonify({'error': f'Invalid point: {point}'}), 400
+
+    track = get_live_track(track_id, create=True)
+    if track is None:
+        return jsonify({'error': 'Invalid track id or too many live tracks'}), 400
+    added = sum(track.add_point(*point) for point in parsed_points)
+
+    return jsonify({'added': added, 'points': len(track.latitudes)})
+
+def live_options():
+    options = [{'label': f'{track_id} (HTTP)', 'value': f'http:{track_id}'} for track_id in list(live_tracks)]
+    options += [
+        {'label': os.path.basename(file_path), 'value': f'file:{file_path}'}
+        for file_path in glob.glob(os.path.join(live_folder, '*.gpx'))
+    ]
+    return options
+
+def get_track(value):
+    source, _, name = value.partition(':')
+    if source == 'file':
+        return follow_gpx(name, live_folder)
+    return get_live_track(name)
+
+def create_live_figures(points):
+    map_fig = go.Figure(go.Scattermapbox(
+        lat=points['latitudes'],
+        lon=points['longitudes'],
+        mode='lines',
+        line=dict(width=3, color='blue'),
+        hoverinfo='none'
+    ))
+    map_fig.update_layout(
+        **tile_layout(),
+        mapbox=dict(
+            center=go.layout.mapbox.Center(
+                lat=points['latitudes'][-1] if points['latitudes'] else 50,
+                lon=points['longitudes'][-1] if points['longitudes'] else 15
+            ),
+            zoom=14
+        ),
+        margin={"r":0, "t":0, "l":0, "b":0},
+        # Keep the user's zoom and position while points are appended
+        uirevision='live'
+    )
+
+    combined_fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.1)
+    combined_fig.add_trace(go.Scatter(
+        x=points['distances_kilometers'],
+        y=points['elevations'],
+        mode='lines',
+        line=dict(color='green'),
+        hovertemplate='Elevation: %{y:.2f} m<extra></extra>'
+    ), row=1, col=1)
+    combined_fig.add_trace(go.Scatter(
+        x=points['distances_kilometers'],
+        y=points['smoothed_speeds'],
+        mode='lines',
+        line=dict(color='red'),
+        hovertemplate='Speed: %{y:.2f} km/h<extra></extra>'
+    ), row=2, col=1)
+    combined_fig.update_layout(
+        xaxis_title='Distance (km)',
+        yaxis1_title='Elevation (m)',
+        yaxis2_title='Speed (km/h)',
+        showlegend=False,
+        margin={"r":0, "t":0, "l":0, "b":0},
+        uirevision='live'
+    )
+
+    return map_fig, combined_fig
+
+def create_live_metrics(metrics):
+    card_style = {'width': '25%', 'margin-right': '10px', 'color': 'white', 'border-color': 'white', 'background': 'radial-gradient(circle at 10% 20%, rgb(0, 0, 0) 0%, rgb(64, 64, 64) 90.2%)'}
+    values = [
+        ("Total Distance:", f'{metrics["total_distance"]:.2f} km'),
+        ("Current Speed:", f'{metrics["current_speed"]:.2f} km/h'),
+        ("Average Speed:", f'{metrics["average_speed"]:.2f} km/h'),
+        ("Highest Speed:", f'{metrics["highest_speed"]:.2f} km/h'),
+        ("Total Time:", format_time(metrics["total_time_seconds"])),
+        ("Moving Time:", format_time(metrics["moving_time_seconds"])),
+        ("Total Ascent:", f'{metrics["total_ascent"]:.0f} m'),
+        ("Total Descent:", f'{metrics["total_descent"]:.0f} m'),
+    ]
+    cards = [
+        dbc.Card([
+            dbc.CardHeader(header),
+            dbc.CardBody(html.P(value, style={'text-align': 'right', 'fontSize':20}))
+        ], style=card_style)
+        for header, value in values
+    ]
+    return html.Div([
+        html.Div(cards[:4], style={'display': 'flex', 'flexDirection': 'row', 'gap': '10px', 'flex': '1'}),
+        html.Div(cards[4:], style={'display': 'flex', 'flexDirection': 'row', 'gap': '10px', 'flex': '1'}),
+    ], style={'display': 'flex', 'flexDirection': 'column', 'gap': '10px', 'flex': '1'})
+
+# App layout
+layout = html.Div([
+    dbc.Container([
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.Label('Select live activity', style={'fontSize': 30, 'textAlign': 'left'}),
+                        dcc.Dropdown(
+                            id='live-dropdown',
+                            options=live_options(),
+                            placeholder="Select a live activity",
+                            clearable=True,
+                        ),
+                        dcc.Interval(id='live-interval', interval=2000),
+                        dcc.Store(id='live-counts', data={'map_count': 0, 'profile_count': 0}),
+                    ]),
+                ], style={'background': 'linear-gradient(to top, rgb(255, 255, 255) 0%, rgb(64, 64, 64) 100%)', 'border': '0px'}),
+            ]),
+        ]),
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Live trace:", style={'fontSize': 30, 'textAlign': 'left'}),
+                    dbc.CardBody([
+                        html.Div([
+                            dcc.Graph(id='live-graph', style={'flex': '1', 'height': '400px'}),
+                            dcc.Graph(id='live-map', className="map", style={'flex': '1', 'height': '400px'}),
+                        ], style={'display': 'flex', 'flexDirection': 'row', 'gap': '10px', 'flex': '1', 'flexWrap': 'wrap'}),
+                    ]),
+                ]),
+            ]),
+        ]),
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Live Information", style={'fontSize': 30, 'textAlign': 'left', 'color': 'black'}),
+                    dbc.CardBody([
+                        html.Div(id='live-metrics', style={'padding': '10px'}),
+                    ]),
+                ], style={'background': 'linear-gradient(to top, rgb(64, 64, 64) 0%, rgb(255, 255, 255) 100%)', 'border': '0px'}),
+            ]),
+        ]),
+    ])
+], style={'background': 'linear-gradient(to top, rgb(255, 255, 255) 0%, rgb(64, 64, 64) 100%)'})
+
+@app.callback(
+    Output('live-dropdown', 'options'),
+    Input('live-interval', 'n_intervals')
+)
+def update_live_options(n_intervals):
+    return live_options()
+
+# Send the full figures once when an activity is selected, afterwards only append the new points
+@app.callback(
+    [Output('live-map', 'figure'),
+     Output('live-graph', 'figure'),
+     Output('live-map', 'extendData'),
+     Output('live-graph', 'extendData'),
+     Output('live-metrics', 'children'),
+     Output('live-counts', 'data')],
+    [Input('live-dropdown', 'value'),
+     Input('live-interval', 'n_intervals')],
+    [State('live-counts', 'data')]
+)
+def update_live(value, n_intervals, counts):
+    if not value:
+        return {}, {}, dash.no_update, dash.no_update, html.Div(), {'map_count': 0, 'profile_count': 0}
+
+    track = get_track(value)
+    if track is None:
+        return {}, {}, dash.no_update, dash.no_update, html.Div(), {'map_count': 0, 'profile_count': 0}
+
+    if dash.ctx.triggered_id == 'live-dropdown' or not counts:
+        points = track.points_since(0, 0)
+        map_fig, combined_fig = create_live_figures(points)
+        counts = {'map_count': points['map_count'], 'profile_count': points['profile_count']}
+        return map_fig, combined_fig, dash.no_update, dash.no_update, create_live_metrics(points['metrics']), counts
+
+    points = track.points_since(counts['map_count'], counts['profile_count'])
+    if points['map_count'] == counts['map_count']:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
+
+    map_extend = (dict(lat=[points['latitudes']], lon=[points['longitudes']]), [0])
+    graph_extend = (
+        dict(x=[points['distances_kilometers'], points['distances_kilometers']],
+             y=[points['elevations'], points['smoothed_speeds']]),
+        [0, 1]
+    )
+    counts = {'map_count': points['map_count'], 'profile_count': points['profile_count']}
+    return dash.no_update, dash.no_update, map_extend, graph_extend, create_live_metrics(points['metrics']), counts
+
+if __name__ == '__main__':
+    app.run_server(debug=True)
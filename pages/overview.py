@@ -1,62 +1,34 @@
-import gpxpy
 import dash
-from dash import Input, Output, State
+from dash import Input, Output, State, Patch
 from dash import dcc, html
 import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
-import numpy as np
-import pandas as pd
 import os
 import re
 import glob
 from app import app
-from plotly.subplots import make_subplots
+from utils.energy import calculate_energy
+from utils.splits import calculate_efforts, personal_records
+from utils.profile_store import load_profile
+from utils.tiles import tile_layout, seed_track_tiles
+from utils.track_cache import load_or_create_track
+from utils.tracks import load_data, format_time, create_map_figure, create_combined_figure
+from utils.users import data_root, get_data_folder, is_user_file
 from datetime import datetime
 import requests
 import xml.etree.ElementTree as ET
 
 dash.register_page(__name__, path='/')
 
-# Function to parse GPX file
-def parse_gpx(file_path):
-    with open(file_path, 'r') as gpx_file:
-        gpx = gpxpy.parse(gpx_file)
-    
-    latitudes = []
-    longitudes = []
-    times = []
-    elevations = []
-    
-    for track in gpx.tracks:
-        for segment in track.segments:
-            for point in segment.points:
-                latitudes.append(point.latitude)
-                longitudes.append(point.longitude)
-                times.append(point.time)
-                elevations.append(point.elevation)
-    
-    return latitudes, longitudes, times, elevations
-
-# Haversine formula to calculate distance between two points
-def haversine(lat1, lon1, lat2, lon2):
-    from math import radians, sin, cos, sqrt, asin
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlon = lon2 - lon1 
-    dlat = lat2 - lat1 
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a)) 
-    r = 6371  # Radius of Earth in kilometers
-    return c * r * 1000  # Return in meters
-
-def rename_gpx():
+def rename_gpx(folder):
     # Regular expression to match the <time> tag
     time_regex = re.compile(r'<time>(.*?)</time>')
     loc_regex = re.compile(r'<trkpt\s+lat="([+-]?\d+\.\d+)"\s+lon="([+-]?\d+\.\d+)">')
 
     # Iterate over all files in the directory
-    for filename in os.listdir(gpx_folder):
+    for filename in os.listdir(folder):
         if filename.endswith(".gpx"):
-            filepath = os.path.join(gpx_folder, filename)
+            filepath = os.path.join(folder, filename)
                 
             # Open and read the file
             with open(filepath, 'r') as file:
@@ -76,7 +48,7 @@ def rename_gpx():
 
                     # Construct the new filename
                     new_filename = f"{formatted_time}.gpx"
-                    new_filepath = os.path.join(gpx_folder, new_filename)
+                    new_filepath = os.path.join(folder, new_filename)
 
                     # Rename the file
                     os.rename(filepath, new_filepath)
@@ -84,82 +56,137 @@ def rename_gpx():
                 else:
                     print(f"No time tag found in '{filename}'")
 
-# Smooth speed data using rolling average
-def smooth_speed_data(speeds, window_size=5):
-    speed_series = pd.Series(speeds)
-    smoothed_speeds = speed_series.rolling(window=window_size, center=True).mean().fillna(method='bfill').fillna(method='ffill')
-    return smoothed_speeds.tolist()
-
-def calculate_metrics(latitudes, longitudes, times, elevations, pause_threshold_minutes=1):
-    speeds = []
-    distances = []
-    total_distance = 0
-    total_time_seconds = 0
-    
-    pause_threshold_seconds = pause_threshold_minutes * 60
-    
-    for i in range(1, len(times)):
-        lat1, lon1, time1, ele1 = latitudes[i-1], longitudes[i-1], times[i-1], elevations[i-1]
-        lat2, lon2, time2, ele2 = latitudes[i], longitudes[i], times[i], elevations[i]
-        
-        distance = haversine(lat1, lon1, lat2, lon2)
-        time_diff = (time2 - time1).total_seconds()
-        
-        if time_diff > pause_threshold_seconds:
-            continue  # Skip this segment if the pause is significant
-        
-        if time_diff > 0:
-            speed = (distance / time_diff) * 3.6  # Convert to km/h
-        else:
-            speed = 0
-        
-        speeds.append(speed)
-        distances.append(total_distance + distance)
-        total_distance += distance
-        total_time_seconds += time_diff
-
-    smoothed_speeds = smooth_speed_data(speeds)
-
-    highest_speed = max(smoothed_speeds) if smoothed_speeds else 0
-    lowest_speed = min(smoothed_speeds) if smoothed_speeds else 0
-    average_speed = sum(smoothed_speeds) / len(smoothed_speeds) if smoothed_speeds else 0
-    top_elevation = max(elevations)
-    lowest_elevation = min(elevations)
-    
-    metrics = {
-        'highest_speed': highest_speed,
-        'lowest_speed': lowest_speed,
-        'average_speed': average_speed,
-        'total_time_seconds': total_time_seconds,
-        'top_elevation': top_elevation,
-        'lowest_elevation': lowest_elevation,
-        'total_distance': total_distance / 1000,  # Convert to km
-    }
-    
-    return speeds, distances, metrics
-
-def load_data(file_path):
-    # Parse GPX file and calculate metrics
-    latitudes, longitudes, times, elevations = parse_gpx(file_path)
-    speeds, distances, metrics = calculate_metrics(latitudes, longitudes, times, elevations)
-    distances_kilometers = [dist / 1000 for dist in distances]
-    smoothed_speeds = smooth_speed_data(speeds)
-    speeds_normalized = (np.array(speeds) - min(speeds)) / (max(speeds) - min(speeds))
-    
-    return {
-        'latitudes': latitudes,
-        'longitudes': longitudes,
-        'times': times,
-        'distances_kilometers': distances_kilometers,
-        'elevations': elevations,
-        'smoothed_speeds': smoothed_speeds,
-        'speeds_normalized': speeds_normalized,
-        'metrics': metrics
-    }
+def get_cached_data(file_path):
+    # Load data if the file path is new or if data_cache is empty
+    if file_path not in data_cache:
+        # Reuse the track parsed by another worker from the shared disk cache if possible
+        data_cache[file_path] = load_or_create_track(file_path, load_data)
+    return data_cache[file_path]
+
+# Energy and training load are cached per track, activity and profile hash
+def get_cached_energy(file_path, activity, profile_hash):
+    key = (file_path, activity, profile_hash)
+    if key not in energy_cache:
+        profile = load_profile(profile_hash)
+        if not profile:
+            return None
+        energy_cache[key] = calculate_energy(get_cached_data(file_path), activity, profile['weight'], profile['height'], profile['age'], profile['sex'])
+    return energy_cache[key]
+
+def create_hover_patches(hoverData_plot, file_path):
+    # Only highlight points hovered on the selected track, not on the compared ones
+    if not hoverData_plot or hoverData_plot['points'][0]['curveNumber'] not in (0, 1):
+        return dash.no_update, dash.no_update
+    if not file_path or not is_user_file(file_path, gpx_folder):
+        return dash.no_update, dash.no_update
+
+    data = get_cached_data(file_path)
+    point_index = hoverData_plot['points'][0]['pointIndex']
+    lat = float(data['latitudes'][point_index + 1])
+    lon = float(data['longitudes'][point_index + 1])
+
+    # Update map figures
+    map_patch = Patch()
+    map_patch['data'][0]['marker']['size'] = [12 if i == point_index else 7 for i in range(len(data['latitudes']) - 1)]
+    map_patch['layout']['mapbox']['center'] = dict(lat=lat, lon=lon)
+    map_patch['layout']['mapbox']['zoom'] = 14
+
+    # Update combined figures, the elevation and speed traces of the selected track come first
+    combined_patch = Patch()
+    marker_sizes = [10 if i == point_index else 5 for i in range(len(data['smoothed_speeds']))]
+    combined_patch['data'][0]['marker']['size'] = marker_sizes
+    combined_patch['data'][1]['marker']['size'] = marker_sizes
+
+    return map_patch, combined_patch
+
+# Compared tracks of the current user as (name, data) pairs
+def get_compared_tracks(compare_files):
+    return [
+        (os.path.basename(file_path), get_cached_data(file_path))
+        for file_path in (compare_files or []) if file_path and is_user_file(file_path, gpx_folder)
+    ]
+
+# Splits and best efforts only depend on the track, so they are cached per file
+def get_cached_efforts(file_path):
+    if file_path not in efforts_cache:
+        efforts_cache[file_path] = calculate_efforts(get_cached_data(file_path))
+    return efforts_cache[file_path]
+
+# Personal records of all archive tracks of the activity, cached until files are added or removed
+def get_cached_records(activity):
+    archive = tuple(sorted(option['value'] for option in gpx_options()))
+    key = (activity, archive)
+    if key not in records_cache:
+        records_cache[key] = personal_records([
+            get_cached_efforts(file_path) for file_path in archive
+            if guess_activity(float(get_cached_data(file_path)['metrics']['average_speed'])) == activity
+        ])
+    return records_cache[key]
+
+# Determine activity based on average speed
+def guess_activity(average_speed):
+    if average_speed > 17:
+        return 'Cycling'
+    elif 7 <= average_speed <= 17:
+        return 'Running'
+    else:
+        return 'Walking'
+
+# Tables with the per-km splits and the best efforts compared to the personal records of the same activity
+def create_efforts_output(file_path, activity):
+    efforts = get_cached_efforts(file_path)
+    activity = activity or guess_activity(float(get_cached_data(file_path)['metrics']['average_speed']))
+    records = personal_records([efforts, get_cached_records(activity)])
+
+    splits_table = dbc.Table([
+        html.Thead(html.Tr([html.Th("Km"), html.Th("Time"), html.Th("Speed")])),
+        html.Tbody([
+            html.Tr([
+                html.Td(f'{split["distance"]:.2f}'),
+                html.Td(format_time(split['time'])),
+                html.Td(f'{split["speed"]:.2f} km/h'),
+            ])
+            for split in efforts['splits']
+        ]),
+    ], size='sm', striped=True, style={'color': 'white'})
+
+    effort_rows = []
+    for target, time in efforts['distances'].items():
+        record = records['distances'][target]
+        effort_rows.append(html.Tr([
+            html.Td(f'{target / 1000:.0f} km'),
+            html.Td(format_time(time) if time is not None else '-'),
+            html.Td(format_time(record) if record is not None else '-'),
+            html.Td('PR' if time is not None and time == record else ''),
+        ]))
+    for target, distance in efforts['durations'].items():
+        record = records['durations'][target]
+        effort_rows.append(html.Tr([
+            html.Td(f'{target // 60} min'),
+            html.Td(f'{distance / 1000:.2f} km' if distance is not None else '-'),
+            html.Td(f'{record / 1000:.2f} km' if record is not None else '-'),
+            html.Td('PR' if distance is not None and distance == record else ''),
+        ]))
+    efforts_table = dbc.Table([
+        html.Thead(html.Tr([html.Th("Best effort"), html.Th("This activity"), html.Th(f"Record ({activity})"), html.Th("")])),
+        html.Tbody(effort_rows),
+    ], size='sm', striped=True, style={'color': 'white'})
+
+    card_style = {'flex': '1', 'color': 'white', 'border-color': 'white', 'background': 'radial-gradient(circle at 10% 20%, rgb(0, 0, 0) 0%, rgb(64, 64, 64) 90.2%)'}
+    return html.Div([
+        dbc.Card([
+            dbc.CardHeader("Splits:"),
+            dbc.CardBody(splits_table, style={'maxHeight': '300px', 'overflowY': 'auto'})
+        ], style=card_style),
+        dbc.Card([
+            dbc.CardHeader("Best Efforts:"),
+            dbc.CardBody(efforts_table)
+        ], style=card_style),
+    ], style={'display': 'flex', 'flexDirection': 'row', 'flexWrap': 'wrap', 'gap': '10px', 'marginTop': '10px'})
 
 # Create the map layout
 map_layout = go.Layout(
-    mapbox_style='open-street-map',
+    **tile_layout(),
     hovermode='closest',
     showlegend=False,
 )
@@ -169,12 +196,30 @@ map_figure = go.Figure(data=[go.Scattermapbox()], layout=map_layout)
 
 # Global variables to store data
 data_cache = {}
+energy_cache = {}
+efforts_cache = {}
+records_cache = {}
 prev_selected_file = None
 
 # Get list of GPX files
 gpx_folder = os.path.dirname(os.path.abspath(__file__)).replace('pages', 'data')
-rename_gpx()
+rename_gpx(gpx_folder)
 gpx_files = [f for f in os.listdir(gpx_folder) if f.endswith('.gpx')]
+renamed_folders = {gpx_folder}
+
+# GPX files of the current user as dropdown options
+def gpx_options():
+    folder = get_data_folder(gpx_folder)
+    if folder not in renamed_folders:
+        rename_gpx(folder)
+        renamed_folders.add(folder)
+    return [
+        {'label': f'{file_name}', 'value': file_path}
+        for file_name, file_path in zip(
+            [os.path.basename(file_path) for file_path in glob.glob(os.path.join(folder, '*.gpx'))],
+            glob.glob(os.path.join(folder, '*.gpx'))
+        )
+    ]
 
 # App layout
 layout = html.Div([
@@ -195,13 +240,8 @@ layout = html.Div([
                             html.Div([
                                 dcc.Dropdown(
                                     id='gpx-dropdown',
-                                    options=[
-                                        {'label': f'{file_name}', 'value': file_path}
-                                        for file_name, file_path in zip(
-                                            [os.path.basename(file_path) for file_path in glob.glob(os.path.join(gpx_folder, '*.gpx'))],
-                                            glob.glob(os.path.join(gpx_folder, '*.gpx'))
-                                        )
-                                    ],
+                                    # Per-user options are filled in by update_options
+                                    options=[] if data_root else gpx_options(),
                                     placeholder="Select a GPX file",
                                     clearable=True,
                                     searchable=True,
@@ -219,13 +259,8 @@ layout = html.Div([
                             html.Div([
                                 dcc.Dropdown(
                                     id='gpx-dropdown-mobile',
-                                    options=[
-                                        {'label': f'{file_name}', 'value': file_path}
-                                        for file_name, file_path in zip(
-                                            [os.path.basename(file_path) for file_path in glob.glob(os.path.join(gpx_folder, '*.gpx'))],
-                                            glob.glob(os.path.join(gpx_folder, '*.gpx'))
-                                        )
-                                    ],
+                                    # Per-user options are filled in by update_options
+                                    options=[] if data_root else gpx_options(),
                                     placeholder="Select a GPX file",
                                     clearable=True,
                                     searchable=True,
@@ -238,8 +273,27 @@ layout = html.Div([
                                     persistence=True,
                                     style={'marginTop': '10px'},
                                 ),
+                                dcc.Dropdown(
+                                    id='compare-dropdown-mobile',
+                                    options=[],
+                                    placeholder="Compare with other activities",
+                                    multi=True,
+                                    clearable=True,
+                                    searchable=True,
+                                    style={'marginTop': '10px'},
+                                ),
                             ], className="mobile-visible", style={'width': '100%', 'margin-bottom': '10px'}),
                         ], style={'display': 'flex', 'flexDirection': 'row', 'gap': '10px', 'flex': '1'}),
+                        html.Div([
+                            dcc.Dropdown(
+                                id='compare-dropdown',
+                                options=[],
+                                placeholder="Compare with other activities",
+                                multi=True,
+                                clearable=True,
+                                searchable=True,
+                            ),
+                        ], className="desktop-visible", style={'width': '100%', 'marginTop': '10px'}),
                     ]),
                 ], style={'background': 'linear-gradient(to top, rgb(255, 255, 255) 0%, rgb(64, 64, 64) 100%)', 'border': '0px'}),
             ]),
@@ -275,7 +329,9 @@ layout = html.Div([
                     dbc.CardHeader("Trace Information", className="mobile-visible", style={'fontSize': '4vw', 'textAlign': 'left', 'color': 'black'}),
                     dbc.CardBody([
                         html.Div(id='metrics-output', className="desktop-visible", style={'padding': '10px'}),
-                        html.Div(id='metrics-output-mobile', className="mobile-visible", style={'padding': '10px'})
+                        html.Div(id='metrics-output-mobile', className="mobile-visible", style={'padding': '10px'}),
+                        html.Div(id='efforts-output', className="desktop-visible", style={'padding': '10px'}),
+                        html.Div(id='efforts-output-mobile', className="mobile-visible", style={'padding': '10px'}),
                     ]),
                 ], style={'background': 'linear-gradient(to top, rgb(64, 64, 64) 0%, rgb(255, 255, 255) 100%)', 'border': '0px'}),
             ]),
@@ -288,121 +344,37 @@ layout = html.Div([
      Output('gpx-map', 'figure'),
      Output('combined-graph', 'figure')],
     [Input('gpx-dropdown', 'value'),
-     Input('combined-graph', 'hoverData'),
-     Input('activity-dropdown', 'value')],
-    [State('store_weight', 'data'),
-     State('store_height', 'data'),
-     State('store_age', 'data'),
-     State('store_sex', 'data'),]
+     Input('activity-dropdown', 'value'),
+     Input('compare-dropdown', 'value')],
+    [State('store_profile', 'data')]
 )
-def update_output(file_path, hoverData_plot, activity, weight, height, age, sex):
-    global data_cache
-
-    if not file_path:
+def update_output(file_path, activity, compare_files, profile_hash):
+    if not file_path or not is_user_file(file_path, gpx_folder):
         return [html.Div(), {}, {}]
 
-    # Load data if the file path is new or if data_cache is empty
-    if file_path not in data_cache:
-        data_cache[file_path] = load_data(file_path)
-
-    data = data_cache[file_path]
+    data = get_cached_data(file_path)
+    # Only the displayed track is pre-seeded, not every track loaded for comparisons or records
+    seed_track_tiles(data['latitudes'], data['longitudes'])
     
     # Format metrics
     metrics = data['metrics']
-    times = data['times']
-    formatted_times = [time.strftime('%Y-%m-%d %H:%M:%S %Z').replace(' Z', '') for time in times]  # Convert datetime to string
-    # Combine speed and time for hover info
-    hover_texts = [
-        f"Speed: {speed:.2f} km/h<br>Time: {time}"
-        for speed, time in zip(data['smoothed_speeds'], formatted_times)
-    ]
-    total_time_seconds = metrics['total_time_seconds']
-    hours, minutes, seconds = int(total_time_seconds // 3600), int((total_time_seconds % 3600) // 60), int(total_time_seconds % 60)
-    total_time_formatted = f"{hours:02}:{minutes:02}:{seconds:02}"
-    
-    map_fig = go.Figure(go.Scattermapbox(
-        lat=data['latitudes'][1:],
-        lon=data['longitudes'][1:],
-        mode='markers+lines',
-        marker=dict(size=7, color=data['speeds_normalized'], colorscale='turbo'),
-        line=dict(width=2, color='blue'),
-        text=hover_texts,
-        hoverinfo='text'
-    ))
-    
-    map_fig.update_layout(
-        mapbox_style="open-street-map",
-        mapbox=dict(
-            center=go.layout.mapbox.Center(
-                lat=data['latitudes'][len(data['latitudes']) // 2],
-                lon=data['longitudes'][len(data['longitudes']) // 2]
-            ),
-            zoom=10
-        ),
-        margin={"r":0, "t":0, "l":0, "b":0}
-    )
-
-    # Create the combined figure with elevation and speed profiles
-    elev_fig = go.Scatter(
-        x=data['distances_kilometers'],
-        y=data['elevations'],
-        mode='lines+markers',
-        line=dict(color='green'),
-        marker=dict(size=5, color='green'),
-        text=[f'Elevation: {ele:.2f} m' for ele in data['elevations']],
-        hoverinfo='text'
-    )
-
-    speed_fig = go.Scatter(
-        x=data['distances_kilometers'],
-        y=data['smoothed_speeds'],
-        mode='lines+markers',
-        line=dict(color='red'),
-        marker=dict(size=5, color='red'),
-        text=[f'Speed: {speed:.2f} km/h' for speed in data['smoothed_speeds']],
-        hoverinfo='text'
-    )
-
-    combined_fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.1)
-    combined_fig.add_trace(elev_fig, row=1, col=1)
-    combined_fig.add_trace(speed_fig, row=2, col=1)
-    combined_fig.update_layout(
-        xaxis=dict(range=[min(data['distances_kilometers']), max(data['distances_kilometers'])]),
-        xaxis_title='Distance (km)',
-        yaxis1_title='Elevation (m)',
-        yaxis2_title='Speed (km/h)',
-        showlegend=False,
-        margin={"r":0, "t":0, "l":0, "b":0}
-    )
-
-    ## TODO add to the calculation sex information and typical times for running, walking and biking based on Strava measurements
-    if not activity or not weight or not height or not age or not sex:
-        calories_burned = "Please select an activity and enter your personal information in setttings menu."
-    else:
-        total_time = float(total_time_seconds)
-        average_speed = float(metrics["average_speed"])
-
-        # MET values for different activities
-        met_values = {
-            'Running': 9.8,
-            'Cycling': 7.5,
-            'Walking': 3.8
-        }
+    total_time_formatted = format_time(metrics['total_time_seconds'])
 
-        met_value = met_values.get(activity, 1)
-        
-        # Adjust MET value based on elevation gain and average speed
-        elevation_gain_value = metrics["top_elevation"] - metrics["lowest_elevation"]
-        
-        if elevation_gain_value > 500:
-            met_value += 1  # Increase MET value for high elevation gain
-
-        if average_speed > 20:
-            met_value += 1  # Increase MET value for high speed
-
-        calories_burned = met_value * weight * (total_time/3600)
+    # Changing only the activity does not change the track, so the figures are kept and only the energy is updated
+    triggered = dash.ctx.triggered_prop_ids
+    if triggered and all(prop_id.startswith('activity-dropdown') for prop_id in triggered):
+        map_fig, combined_fig = dash.no_update, dash.no_update
+    else:
+        map_fig = create_map_figure(data)
+        combined_fig = create_combined_figure(data, get_compared_tracks(compare_files))
 
-        calories_burned = f'{calories_burned:.2f} kcal'
+    energy = get_cached_energy(file_path, activity, profile_hash) if activity else None
+    if not energy:
+        calories_burned = "Please select an activity and enter your personal information in setttings menu."
+        training_load = ""
+    else:
+        calories_burned = f'{energy["calories"]:.2f} kcal'
+        training_load = f'Training load: {energy["training_load"]:.0f}'
 
     metrics_output = html.Div([
         html.Div([
@@ -438,32 +410,14 @@ def update_output(file_path, hoverData_plot, activity, weight, height, age, sex)
             ], className="desktop-visible", style={'width': '25%', 'margin-right': '10px', 'color': 'white', 'border-color': 'white', 'background': 'radial-gradient(circle at 10% 20%, rgb(0, 0, 0) 0%, rgb(64, 64, 64) 90.2%)'}),
             dbc.Card([
                 dbc.CardHeader("Calories Burned: "),
-                dbc.CardBody(html.P(calories_burned, style={'text-align': 'right', 'fontSize':20}))
+                dbc.CardBody([
+                    html.P(calories_burned, style={'text-align': 'right', 'fontSize':20}),
+                    html.P(training_load, style={'text-align': 'right', 'fontSize':14, 'margin': '0'}),
+                ])
             ], className="desktop-visible", style={'width': '25%', 'margin-right': '10px', 'color': 'white', 'border-color': 'white', 'background': 'radial-gradient(circle at 10% 20%, rgb(0, 0, 0) 0%, rgb(64, 64, 64) 90.2%)'}),
         ], style={'display': 'flex', 'flexDirection': 'row', 'gap': '10px', 'flex': '1'}),
     ], style={'display': 'flex', 'flexDirection': 'column', 'gap': '10px', 'flex': '1'})
 
-    if hoverData_plot:
-        point_index = hoverData_plot['points'][0]['pointIndex']
-        lat = data['latitudes'][point_index + 1]
-        lon = data['longitudes'][point_index + 1]
-
-        # Update map figures
-        map_fig.update_traces(
-            marker=dict(size=[12 if i == point_index else 7 for i in range(len(data['latitudes']) - 1)])
-        )
-        map_fig.update_layout(
-            mapbox=dict(
-                center=go.layout.mapbox.Center(lat=lat, lon=lon),
-                zoom=14
-            )
-        )
-
-        # Update combined figures
-        combined_fig.update_traces(
-            marker=dict(size=[10 if i == point_index else 5 for i in range(len(data['smoothed_speeds']))])
-        )
-
     return metrics_output, map_fig, combined_fig
 
 @app.callback(
@@ -471,121 +425,37 @@ def update_output(file_path, hoverData_plot, activity, weight, height, age, sex)
      Output('gpx-map-mobile', 'figure'),
      Output('combined-graph-mobile', 'figure')],
     [Input('gpx-dropdown-mobile', 'value'),
-     Input('combined-graph-mobile', 'hoverData'),
-     Input('activity-dropdown-mobile', 'value')],
-    [State('store_weight', 'data'),
-     State('store_height', 'data'),
-     State('store_age', 'data'),
-     State('store_sex', 'data'),]
+     Input('activity-dropdown-mobile', 'value'),
+     Input('compare-dropdown-mobile', 'value')],
+    [State('store_profile', 'data')]
 )
-def update_output(file_path, hoverData_plot, activity, weight, height, age, sex):
-    global data_cache
-
-    if not file_path:
+def update_output(file_path, activity, compare_files, profile_hash):
+    if not file_path or not is_user_file(file_path, gpx_folder):
         return [html.Div(), {}, {}]
 
-    # Load data if the file path is new or if data_cache is empty
-    if file_path not in data_cache:
-        data_cache[file_path] = load_data(file_path)
-
-    data = data_cache[file_path]
+    data = get_cached_data(file_path)
+    # Only the displayed track is pre-seeded, not every track loaded for comparisons or records
+    seed_track_tiles(data['latitudes'], data['longitudes'])
     
     # Format metrics
     metrics = data['metrics']
-    times = data['times']
-    formatted_times = [time.strftime('%Y-%m-%d %H:%M:%S %Z').replace(' Z', '') for time in times]  # Convert datetime to string
-    # Combine speed and time for hover info
-    hover_texts = [
-        f"Speed: {speed:.2f} km/h<br>Time: {time}"
-        for speed, time in zip(data['smoothed_speeds'], formatted_times)
-    ]
-    total_time_seconds = metrics['total_time_seconds']
-    hours, minutes, seconds = int(total_time_seconds // 3600), int((total_time_seconds % 3600) // 60), int(total_time_seconds % 60)
-    total_time_formatted = f"{hours:02}:{minutes:02}:{seconds:02}"
-    
-    map_fig = go.Figure(go.Scattermapbox(
-        lat=data['latitudes'][1:],
-        lon=data['longitudes'][1:],
-        mode='markers+lines',
-        marker=dict(size=7, color=data['speeds_normalized'], colorscale='turbo'),
-        line=dict(width=2, color='blue'),
-        text=hover_texts,
-        hoverinfo='text'
-    ))
-    
-    map_fig.update_layout(
-        mapbox_style="open-street-map",
-        mapbox=dict(
-            center=go.layout.mapbox.Center(
-                lat=data['latitudes'][len(data['latitudes']) // 2],
-                lon=data['longitudes'][len(data['longitudes']) // 2]
-            ),
-            zoom=10
-        ),
-        margin={"r":0, "t":0, "l":0, "b":0}
-    )
-
-    # Create the combined figure with elevation and speed profiles
-    elev_fig = go.Scatter(
-        x=data['distances_kilometers'],
-        y=data['elevations'],
-        mode='lines+markers',
-        line=dict(color='green'),
-        marker=dict(size=5, color='green'),
-        text=[f'Elevation: {ele:.2f} m' for ele in data['elevations']],
-        hoverinfo='text'
-    )
-
-    speed_fig = go.Scatter(
-        x=data['distances_kilometers'],
-        y=data['smoothed_speeds'],
-        mode='lines+markers',
-        line=dict(color='red'),
-        marker=dict(size=5, color='red'),
-        text=[f'Speed: {speed:.2f} km/h' for speed in data['smoothed_speeds']],
-        hoverinfo='text'
-    )
-
-    combined_fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.1)
-    combined_fig.add_trace(elev_fig, row=1, col=1)
-    combined_fig.add_trace(speed_fig, row=2, col=1)
-    combined_fig.update_layout(
-        xaxis=dict(range=[min(data['distances_kilometers']), max(data['distances_kilometers'])]),
-        xaxis_title='Distance (km)',
-        yaxis1_title='Elevation (m)',
-        yaxis2_title='Speed (km/h)',
-        showlegend=False,
-        margin={"r":0, "t":0, "l":0, "b":0}
-    )
-
-    ## TODO add to the calculation sex information and typical times for running, walking and biking based on Strava measurements
-    if not activity or not weight or not height or not age or not sex:
-        calories_burned = "Please select an activity and enter your personal information in setttings menu."
-    else:
-        total_time = float(total_time_seconds)
-        average_speed = float(metrics["average_speed"])
-
-        # MET values for different activities
-        met_values = {
-            'Running': 9.8,
-            'Cycling': 7.5,
-            'Walking': 3.8
-        }
-
-        met_value = met_values.get(activity, 1)
-        
-        # Adjust MET value based on elevation gain and average speed
-        elevation_gain_value = metrics["top_elevation"] - metrics["lowest_elevation"]
-        
-        if elevation_gain_value > 500:
-            met_value += 1  # Increase MET value for high elevation gain
-
-        if average_speed > 20:
-            met_value += 1  # Increase MET value for high speed
+    total_time_formatted = format_time(metrics['total_time_seconds'])
 
-        calories_burned = met_value * weight * (total_time/3600)
+    # Changing only the activity does not change the track, so the figures are kept and only the energy is updated
+    triggered = dash.ctx.triggered_prop_ids
+    if triggered and all(prop_id.startswith('activity-dropdown') for prop_id in triggered):
+        map_fig, combined_fig = dash.no_update, dash.no_update
+    else:
+        map_fig = create_map_figure(data)
+        combined_fig = create_combined_figure(data, get_compared_tracks(compare_files))
 
-        calories_burned = f'{calories_burned:.2f} kcal'
+    energy = get_cached_energy(file_path, activity, profile_hash) if activity else None
+    if not energy:
+        calories_burned = "Please select an activity and enter your personal information in setttings menu."
+        training_load = ""
+    else:
+        calories_burned = f'{energy["calories"]:.2f} kcal'
+        training_load = f'Training load: {energy["training_load"]:.0f}'
 
     metrics_output = html.Div([
         html.Div([
@@ -626,33 +496,15 @@ def update_output(file_path, hoverData_plot, activity, weight, height, age, sex)
                     'background': 'radial-gradient(circle at 10% 20%, rgb(0, 0, 0) 0%, rgb(64, 64, 64) 90.2%)'}),
             dbc.Card([
                 dbc.CardHeader("Calories Burned:"),
-                dbc.CardBody(html.P(calories_burned, style={'text-align': 'right', 'fontSize': 20}))
+                dbc.CardBody([
+                    html.P(calories_burned, style={'text-align': 'right', 'fontSize': 20}),
+                    html.P(training_load, style={'text-align': 'right', 'fontSize': 14, 'margin': '0'}),
+                ])
             ], className="mobile-visible", style={'width': '100%', 'margin-bottom': '10px', 'color': 'white', 'border-color': 'white', 
                     'background': 'radial-gradient(circle at 10% 20%, rgb(0, 0, 0) 0%, rgb(64, 64, 64) 90.2%)'}),
         ], className="mobile-visible", style={'display': 'flex', 'flexDirection': 'column', 'gap': '10px'}),
     ], style={'display': 'flex', 'flexDirection': 'column', 'gap': '10px', 'flex': '1'})
 
-    if hoverData_plot:
-        point_index = hoverData_plot['points'][0]['pointIndex']
-        lat = data['latitudes'][point_index + 1]
-        lon = data['longitudes'][point_index + 1]
-
-        # Update map figures
-        map_fig.update_traces(
-            marker=dict(size=[12 if i == point_index else 7 for i in range(len(data['latitudes']) - 1)])
-        )
-        map_fig.update_layout(
-            mapbox=dict(
-                center=go.layout.mapbox.Center(lat=lat, lon=lon),
-                zoom=14
-            )
-        )
-
-        # Update combined figures
-        combined_fig.update_traces(
-            marker=dict(size=[10 if i == point_index else 5 for i in range(len(data['smoothed_speeds']))])
-        )
-
     return metrics_output, map_fig, combined_fig
 
 # Define a callback to update the activity dropdown based on the average speed
@@ -661,21 +513,11 @@ def update_output(file_path, hoverData_plot, activity, weight, height, age, sex)
     Input('gpx-dropdown', 'value')
 )
 def update_activity_dropdown(file_path):
-    if file_path:
-        if file_path not in data_cache:
-            data_cache[file_path] = load_data(file_path)
-
-        data = data_cache[file_path]
+    if file_path and is_user_file(file_path, gpx_folder):
+        data = get_cached_data(file_path)
         metrics = data['metrics']
         average_speed = float(metrics["average_speed"])  # in km/h
-        
-        # Determine activity based on average speed
-        if average_speed > 17:
-            return 'Cycling'
-        elif 7 <= average_speed <= 17:
-            return 'Running'
-        else:
-            return 'Walking'
+        return guess_activity(average_speed)
     
     return None  # Default value if no file is selected
 
@@ -685,51 +527,77 @@ def update_activity_dropdown(file_path):
     Input('gpx-dropdown-mobile', 'value')
 )
 def update_activity_dropdown(file_path):
-    if file_path:
-        if file_path not in data_cache:
-            data_cache[file_path] = load_data(file_path)
-
-        data = data_cache[file_path]
+    if file_path and is_user_file(file_path, gpx_folder):
+        data = get_cached_data(file_path)
         metrics = data['metrics']
         average_speed = float(metrics["average_speed"])  # in km/h
-        
-        # Determine activity based on average speed
-        if average_speed > 17:
-            return 'Cycling'
-        elif 7 <= average_speed <= 17:
-            return 'Running'
-        else:
-            return 'Walking'
+        return guess_activity(average_speed)
     
     return None  # Default value if no file is selected
 
+# Highlight the hovered point by patching only the marker sizes and map center, the comparison overlays are not re-sent
 @app.callback(
-    Output('gpx-dropdown', 'options'),
+    [Output('gpx-map', 'figure', allow_duplicate=True),
+     Output('combined-graph', 'figure', allow_duplicate=True)],
+    [Input('combined-graph', 'hoverData')],
+    [State('gpx-dropdown', 'value')],
+    prevent_initial_call=True
+)
+def update_hover(hoverData_plot, file_path):
+    return create_hover_patches(hoverData_plot, file_path)
+
+# Highlight the hovered point by patching only the marker sizes and map center, the comparison overlays are not re-sent
+@app.callback(
+    [Output('gpx-map-mobile', 'figure', allow_duplicate=True),
+     Output('combined-graph-mobile', 'figure', allow_duplicate=True)],
+    [Input('combined-graph-mobile', 'hoverData')],
+    [State('gpx-dropdown-mobile', 'value')],
+    prevent_initial_call=True
+)
+def update_hover(hoverData_plot, file_path):
+    return create_hover_patches(hoverData_plot, file_path)
+
+@app.callback(
+    Output('efforts-output', 'children'),
+    [Input('gpx-dropdown', 'value'),
+     Input('activity-dropdown', 'value')]
+)
+def update_efforts(file_path, activity):
+    if not file_path or not is_user_file(file_path, gpx_folder):
+        return html.Div()
+    return create_efforts_output(file_path, activity)
+
+@app.callback(
+    Output('efforts-output-mobile', 'children'),
+    [Input('gpx-dropdown-mobile', 'value'),
+     Input('activity-dropdown-mobile', 'value')]
+)
+def update_efforts(file_path, activity):
+    if not file_path or not is_user_file(file_path, gpx_folder):
+        return html.Div()
+    return create_efforts_output(file_path, activity)
+
+@app.callback(
+    [Output('gpx-dropdown', 'options'),
+     Output('compare-dropdown', 'options')],
     [Input('gpx-dropdown', 'value')]
 )
 def update_options(selected_value):
-    updated_options = [
-        {'label': f'{file_name}', 'value': file_path}
-        for file_name, file_path in zip(
-            [os.path.basename(file_path) for file_path in glob.glob(os.path.join(gpx_folder, '*.gpx'))],
-            glob.glob(os.path.join(gpx_folder, '*.gpx'))
-        )
-    ]
-    return updated_options
+    updated_options = gpx_options()
+    # The selected activity is the reference, so it cannot be compared with itself
+    compare_options = [option for option in updated_options if option['value'] != selected_value]
+    return updated_options, compare_options
 
 @app.callback(
-    Output('gpx-dropdown-mobile', 'options'),
+    [Output('gpx-dropdown-mobile', 'options'),
+     Output('compare-dropdown-mobile', 'options')],
     [Input('gpx-dropdown-mobile', 'value')]
 )
 def update_options(selected_value):
-    updated_options = [
-        {'label': f'{file_name}', 'value': file_path}
-        for file_name, file_path in zip(
-            [os.path.basename(file_path) for file_path in glob.glob(os.path.join(gpx_folder, '*.gpx'))],
-            glob.glob(os.path.join(gpx_folder, '*.gpx'))
-        )
-    ]
-    return updated_options
+    updated_options = gpx_options()
+    # The selected activity is the reference, so it cannot be compared with itself
+    compare_options = [option for option in updated_options if option['value'] != selected_value]
+    return updated_options, compare_options
 
 if __name__ == '__main__':
     app.run_server(debug=True)
\ No newline at end of file
@@ -3,8 +3,10 @@ from dash.dependencies import Input, Output, State
 import dash_bootstrap_components as dbc
 from dash import dcc
 from dash import html
+from dash.exceptions import PreventUpdate
 from app import app
 from dash import Input, Output, State
+from utils.profile_store import validate_profile, save_profile, load_session_profile
 
 dash.register_page(__name__, path='/')
 
@@ -18,13 +20,14 @@ layout = html.Div([
                     dbc.CardBody([
                         html.Div([
                             html.Div([
-                                dcc.Input(id='weight-input', type='number', placeholder='Weight (kg)', persistence=True, style={'width': '25%', 'margin-right': '10px'}),
-                                dcc.Input(id='height-input', type='number', placeholder='Height (cm)', persistence=True, style={'width': '25%', 'margin-right': '10px'}),
-                                dcc.Input(id='age-input', type='number', placeholder='Age', persistence=True, style={'width': '25%', 'margin-right': '10px'}),
+                                dcc.Input(id='weight-input', type='number', placeholder='Weight (kg)', debounce=True, style={'width': '25%', 'margin-right': '10px'}),
+                                dcc.Input(id='height-input', type='number', placeholder='Height (cm)', debounce=True, style={'width': '25%', 'margin-right': '10px'}),
+                                dcc.Input(id='age-input', type='number', placeholder='Age', debounce=True, style={'width': '25%', 'margin-right': '10px'}),
                                 html.Div([
-                                    dcc.Dropdown(id='sex-input', placeholder='Sex', options=['Male', 'Female'], persistence=True),
+                                    dcc.Dropdown(id='sex-input', placeholder='Sex', options=['Male', 'Female']),
                                 ], style={'width': '25%', 'margin-right': '10px'})
                             ], style={'display': 'flex', 'flexDirection': 'row', 'gap': '10px', 'flex': '1'}),
+                            html.Div(id='profile-status', style={'marginTop': '10px', 'color': 'red'}),
                         ]),
                     ]),
                 ]),
@@ -33,24 +36,46 @@ layout = html.Div([
     ]),
 ])
 
-@app.callback([Output('store_weight', 'data'),
-               Output('store_height', 'data'),
-               Output('store_age', 'data'),
-               Output('store_sex', 'data')],
+# Fill in the inputs from the profile stored on the server for this session
+@app.callback([Output('weight-input', 'value'),
+               Output('height-input', 'value'),
+               Output('age-input', 'value'),
+               Output('sex-input', 'value')],
+              [Input('store_session', 'data')])
+def load_inputs(session_id):
+    profile_hash, profile = load_session_profile(session_id)
+    if not profile:
+        raise PreventUpdate
+    return profile['weight'], profile['height'], profile['age'], profile['sex']
+
+@app.callback([Output('store_profile', 'data'),
+               Output('profile-status', 'children')],
               [Input('weight-input','value'),
                Input('height-input','value'),
                Input('age-input','value'),
                Input('sex-input','value')],
-              [State('store_weight', 'data'),
-               State('store_height', 'data'),
-               State('store_age', 'data'),
-               State('store_sex', 'data')])
-def update_slider(weight, height, age, sex, weight_data, height_data, age_data, sex_data):
-    weight_data = float(weight)
-    height_data = float(height)
-    age_data = int(age)
-    sex_data = str(sex)
-    return weight_data, height_data, age_data, sex_data
+              [State('store_session', 'data'),
+               State('store_profile', 'data')])
+def update_profile(weight, height, age, sex, session_id, profile_hash):
+    if not session_id:
+        raise PreventUpdate
+    # Nothing entered yet, e.g. on the first visit
+    if all(value is None or value == '' for value in [weight, height, age, sex]):
+        return dash.no_update, ''
+
+    profile, errors = validate_profile(weight, height, age, sex)
+    if errors:
+        return dash.no_update, ' '.join(errors)
+
+    # The inputs were filled in from the stored profile, so there is nothing to save
+    stored_profile_hash, stored_profile = load_session_profile(session_id)
+    if profile == stored_profile:
+        return (stored_profile_hash if stored_profile_hash != profile_hash else dash.no_update), ''
+
+    new_profile_hash = save_profile(session_id, profile)
+    if new_profile_hash == profile_hash:
+        return dash.no_update, ''
+    return new_profile_hash, ''
 
 if __name__ == "__main__":
     app.run_server(debug=True)
\ No newline at end of file
@@ -0,0 +1,131 @@
+import os
+
+import numpy as np
+
+from utils.geo import haversine, haversine_array
+
+# Limits for rejecting GPS fixes, speed in km/h and acceleration in m/s^2
+MAX_SPEED = 100
+MAX_ACCELERATION = 5
+# Fixes slower than this (km/h) that stay closer than this (m) to where the athlete stopped are stationary jitter
+STATIONARY_RADIUS = 5
+STATIONARY_SPEED = 2
+# Passes of the outlier rejection, removing a spike can reveal the next one
+MAX_PASSES = 3
+
+# Kalman filter noise, position measurement (m) and acceleration process noise (m/s^2)
+MEASUREMENT_NOISE = 5
+PROCESS_NOISE = 1
+
+# Enable the optional Kalman smoothing of positions
+use_kalman = os.environ.get('GPS_KALMAN_FILTER', '').lower() in ('1', 'true', 'yes')
+
+# Settings that change the cleaned track, part of the track cache key
+def cleaning_config():
+    return (use_kalman, MAX_SPEED, MAX_ACCELERATION, STATIONARY_RADIUS, STATIONARY_SPEED, MAX_PASSES, MEASUREMENT_NOISE, PROCESS_NOISE)
+
+def segment_speeds(latitudes, longitudes, seconds):
+    distances = haversine_array(latitudes, longitudes)
+    durations = np.diff(seconds)
+    speeds = np.divide(distances, durations, out=np.zeros_like(distances), where=durations > 0)
+    return distances, durations, speeds
+
+# Points that cannot be reached from both neighbours without exceeding the speed or acceleration limits
+def find_outliers(latitudes, longitudes, seconds):
+    distances, durations, speeds = segment_speeds(latitudes, longitudes, seconds)
+    outliers = np.zeros(len(seconds), dtype=bool)
+
+    # A jump makes both the segment into the point and the one out of it too fast
+    too_fast = speeds * 3.6 > MAX_SPEED
+    outliers[1:-1] = too_fast[:-1] & too_fast[1:]
+
+    # A smaller jump shows as a sudden speed-up followed by a sudden slow-down, either around
+    # the displaced point or, for a wrong timestamp, at both ends of a single segment
+    accelerations = np.zeros(len(seconds))
+    accelerations[1:-1] = np.diff(speeds) / np.maximum((durations[:-1] + durations[1:]) / 2, 1)
+    speed_up = accelerations > MAX_ACCELERATION
+    slow_down = accelerations < -MAX_ACCELERATION
+    outliers[1:-1] |= speed_up[:-2] & slow_down[2:]
+    outliers[1:] |= speed_up[:-1] & slow_down[1:]
+
+    # Invalid or duplicated timestamps
+    outliers[1:] |= durations <= 0
+    return outliers
+
+# Points that only jitter around the point where the athlete stopped. The distance is measured from
+# the first point of the stationary cluster, so slow movement that drifts away from it is kept.
+def find_stationary(latitudes, longitudes, seconds):
+    stationary = np.zeros(len(seconds), dtype=bool)
+    anchor = 0
+    for i in range(1, len(seconds)):
+        distance = haversine(latitudes[anchor], longitudes[anchor], latitudes[i], longitudes[i])
+        duration = seconds[i] - seconds[anchor]
+        if distance < STATIONARY_RADIUS and duration > 0 and distance / duration * 3.6 < STATIONARY_SPEED:
+            stationary[i] = True
+        else:
+            anchor = i
+    # Always keep the last point so the end of the activity is not lost
+    stationary[-1] = False
+    return stationary
+
+# Constant velocity Kalman filter of the positions in a local metric frame
+def kalman_filter(latitudes, longitudes, seconds):
+    lat0 = np.radians(latitudes[0])
+    meters_per_degree = 6371 * 1000 * np.pi / 180
+    east = (longitudes - longitudes[0]) * meters_per_degree * np.cos(lat0)
+    north = (latitudes - latitudes[0]) * meters_per_degree
+    measurements = np.stack([east, north], axis=1)
+
+    state = np.array([east[0], north[0], 0.0, 0.0])
+    covariance = np.eye(4) * MEASUREMENT_NOISE ** 2
+    observation = np.array([[1, 0, 0, 0], [0, 1, 0, 0]], dtype=float)
+    measurement_covariance = np.eye(2) * MEASUREMENT_NOISE ** 2
+    filtered = np.empty_like(measurements)
+    filtered[0] = measurements[0]
+
+    for i in range(1, len(seconds)):
+        dt = seconds[i] - seconds[i - 1]
+        transition = np.array([[1, 0, dt, 0], [0, 1, 0, dt], [0, 0, 1, 0], [0, 0, 0, 1]], dtype=float)
+        process = PROCESS_NOISE ** 2 * np.array([
+            [dt ** 4 / 4, 0, dt ** 3 / 2, 0],
+            [0, dt ** 4 / 4, 0, dt ** 3 / 2],
+            [dt ** 3 / 2, 0, dt ** 2, 0],
+            [0, dt ** 3 / 2, 0, dt ** 2],
+        ])
+        state = transition @ state
+        covariance = transition @ covariance @ transition.T + process
+
+        innovation = measurements[i] - observation @ state
+        gain = covariance @ observation.T @ np.linalg.inv(observation @ covariance @ observation.T + measurement_covariance)
+        state = state + gain @ innovation
+        covariance = (np.eye(4) - gain @ observation) @ covariance
+        filtered[i] = state[:2]
+
+    latitudes = latitudes[0] + filtered[:, 1] / meters_per_degree
+    longitudes = longitudes[0] + filtered[:, 0] / (meters_per_degree * np.cos(lat0))
+    return latitudes, longitudes
+
+# Cleaning stage between parse_gpx and calculate_metrics: drop GPS jumps and stationary jitter
+def clean_track(latitudes, longitudes, times, elevations, kalman=None):
+    if len(times) < 3:
+        return latitudes, longitudes, times, elevations
+
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    elevations = np.asarray(elevations, dtype=float)
+    seconds = np.array([time.timestamp() for time in times])
+    keep = np.arange(len(times))
+
+    for _ in range(MAX_PASSES):
+        outliers = find_outliers(latitudes[keep], longitudes[keep], seconds[keep])
+        if not outliers.any():
+            break
+        keep = keep[~outliers]
+
+    keep = keep[~find_stationary(latitudes[keep], longitudes[keep], seconds[keep])]
+
+    latitudes, longitudes, elevations, seconds = latitudes[keep], longitudes[keep], elevations[keep], seconds[keep]
+    if use_kalman if kalman is None else kalman:
+        latitudes, longitudes = kalman_filter(latitudes, longitudes, seconds)
+
+    return latitudes.tolist(), longitudes.tolist(), [times[i] for i in keep], elevations.tolist()
@@ -0,0 +1,95 @@
+import numpy as np
+
+# Gravity (m/s^2) and air density (kg/m^3) used by the cycling power model
+GRAVITY = 9.81
+AIR_DENSITY = 1.225
+
+# Cycling model constants: bike mass (kg), rolling resistance and drag area (m^2)
+BIKE_MASS = 10
+ROLLING_RESISTANCE = 0.005
+DRAG_AREA = 0.4
+
+# Resting oxygen uptake (ml/kg/min), 1 MET
+RESTING_VO2 = 3.5
+
+# Below this speed (m/s) the athlete is considered standing
+STANDING_SPEED = 0.5
+
+# Banister TRIMP weighting factors
+TRIMP_FACTORS = {
+    'Male': 1.92,
+    'Female': 1.67
+}
+
+# Mifflin-St Jeor basal metabolic rate in kcal/day
+def calculate_bmr(weight, height, age, sex):
+    bmr = 10 * weight + 6.25 * height - 5 * age
+    return bmr + 5 if sex == 'Male' else bmr - 161
+
+# Non-exercise VO2max estimate (Jackson et al.) in ml/kg/min, assuming a regularly active person
+def estimate_vo2_max(weight, height, age, sex, activity_rating=5):
+    bmi = weight / (height / 100) ** 2
+    vo2_max = 56.363 + 1.921 * activity_rating - 0.381 * age - 0.754 * bmi
+    if sex == 'Male':
+        vo2_max += 10.987
+    return max(vo2_max, RESTING_VO2 * 3)
+
+# Split the cached track arrays into per-segment speed (m/s), grade and duration (s)
+def calculate_segments(data):
+    distances = data['distances_array']
+    elapsed = data['elapsed_seconds']
+    segment_distances = np.diff(distances, prepend=0.0)
+    durations = np.diff(elapsed, prepend=0.0)
+
+    speeds = np.divide(segment_distances, durations, out=np.zeros_like(segment_distances), where=durations > 0)
+    grades = np.divide(data['elevation_changes'], segment_distances, out=np.zeros_like(segment_distances), where=segment_distances > 1)
+    grades = np.clip(grades, -0.3, 0.3)
+
+    return speeds, grades, durations
+
+# Oxygen uptake (ml/kg/min) per segment based on speed, grade and activity
+def calculate_vo2(speeds, grades, activity, weight):
+    uphill = np.clip(grades, 0, None)
+
+    if activity == 'Cycling':
+        # Power needed to overcome rolling resistance, gravity and air drag (W)
+        mass = weight + BIKE_MASS
+        power = (ROLLING_RESISTANCE * mass * GRAVITY
+                 + mass * GRAVITY * grades
+                 + 0.5 * AIR_DENSITY * DRAG_AREA * speeds ** 2) * speeds
+        power = np.clip(power, 0, None)
+        # ACSM leg cycling equation, 1 W = 6.12 kg*m/min
+        vo2 = 10.8 * power / weight + 7
+    else:
+        # ACSM walking and running equations with speed in m/min
+        speeds_m_min = speeds * 60
+        if activity == 'Running':
+            vo2 = 0.2 * speeds_m_min + 0.9 * speeds_m_min * uphill + RESTING_VO2
+        else:
+            vo2 = 0.1 * speeds_m_min + 1.8 * speeds_m_min * uphill + RESTING_VO2
+
+    return np.where(speeds < STANDING_SPEED, RESTING_VO2, vo2)
+
+def calculate_energy(data, activity, weight, height, age, sex):
+    speeds, grades, durations = calculate_segments(data)
+    vo2 = calculate_vo2(speeds, grades, activity, weight)
+    minutes = durations / 60
+
+    # Active energy from the oxygen uptake above rest, ~5 kcal per litre of O2
+    active_calories = float(np.sum((vo2 - RESTING_VO2) * weight * minutes) / 1000 * 5)
+    # Resting energy comes from the sex- and age-adjusted BMR instead of the generic 1 MET
+    bmr = calculate_bmr(weight, height, age, sex)
+    resting_calories = bmr / 1440 * float(np.sum(minutes))
+
+    # TRIMP-style training load with intensity taken as the fraction of VO2 reserve
+    vo2_max = estimate_vo2_max(weight, height, age, sex)
+    intensity = np.clip((vo2 - RESTING_VO2) / (vo2_max - RESTING_VO2), 0, 1)
+    factor = TRIMP_FACTORS.get(sex, TRIMP_FACTORS['Male'])
+    training_load = float(np.sum(minutes * intensity * 0.64 * np.exp(factor * intensity)))
+
+    return {
+        'calories': active_calories + resting_calories,
+        'active_calories': active_calories,
+        'bmr': bmr,
+        'training_load': training_load,
+    }
@@ -0,0 +1,21 @@
+import numpy as np
+from math import radians, sin, cos, sqrt, asin
+
+# Haversine formula to calculate distance between two points
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    dlon = lon2 - lon1 
+    dlat = lat2 - lat1 
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    c = 2 * asin(sqrt(a)) 
+    r = 6371  # Radius of Earth in kilometers
+    return c * r * 1000  # Return in meters
+
+# Vectorized haversine between consecutive points of coordinate arrays, in meters
+def haversine_array(latitudes, longitudes):
+    lat = np.radians(np.asarray(latitudes, dtype=float))
+    lon = np.radians(np.asarray(longitudes, dtype=float))
+    dlat = np.diff(lat)
+    dlon = np.diff(lon)
+    a = np.sin(dlat/2)**2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon/2)**2
+    return 2 * np.arcsin(np.sqrt(np.clip(a, 0, 1))) * 6371 * 1000
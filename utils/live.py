@@ -0,0 +1,199 @@
+import os
+import re
+import threading
+import time as clock
+from collections import deque
+from datetime import datetime, timezone
+
+from utils.geo import haversine
+
+# Same pause rule and smoothing window as calculate_metrics in utils.tracks
+PAUSE_THRESHOLD_SECONDS = 60
+SMOOTHING_WINDOW = 5
+# Segments slower than this (km/h) do not count as moving time
+MOVING_SPEED = 1
+
+# Limits on the live tracks kept in memory, tracks without new points expire after LIVE_TRACK_EXPIRY (s)
+MAX_LIVE_TRACKS = 20
+LIVE_TRACK_EXPIRY = 6 * 3600
+track_id_regex = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+
+# Regular expressions to read complete track points from a growing GPX file
+trkpt_regex = re.compile(r'<trkpt\s+lat="([+-]?\d+\.?\d*)"\s+lon="([+-]?\d+\.?\d*)"\s*>(.*?)</trkpt>', re.S)
+ele_regex = re.compile(r'<ele>(.*?)</ele>')
+time_regex = re.compile(r'<time>(.*?)</time>')
+
+# Times without a timezone are taken as UTC, so they can be compared with the ones that have it
+def parse_time(value):
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+# Track that is updated point by point with O(1) accumulators instead of recalculating all metrics
+class LiveTrack:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latitudes = []
+        self.longitudes = []
+        self.times = []
+        self.elevations = []
+        self.distances_kilometers = []
+        self.profile_elevations = []
+        self.smoothed_speeds = []
+        self.recent_speeds = deque(maxlen=SMOOTHING_WINDOW)
+        self.total_distance = 0
+        self.total_time_seconds = 0
+        self.moving_time_seconds = 0
+        self.total_ascent = 0
+        self.total_descent = 0
+        self.highest_speed = 0
+        self.updated = clock.time()
+
+    def add_point(self, latitude, longitude, time, elevation=None):
+        time = parse_time(time)
+        with self.lock:
+            if elevation is None:
+                elevation = self.elevations[-1] if self.elevations else 0
+            if self.times:
+                if time <= self.times[-1]:
+                    return False  # Ignore duplicated or out of order points
+                self.update_accumulators(latitude, longitude, time, elevation)
+
+            self.latitudes.append(latitude)
+            self.longitudes.append(longitude)
+            self.times.append(time)
+            self.elevations.append(elevation)
+            self.updated = clock.time()
+            return True
+
+    def update_accumulators(self, latitude, longitude, time, elevation):
+        distance = haversine(self.latitudes[-1], self.longitudes[-1], latitude, longitude)
+        time_diff = (time - self.times[-1]).total_seconds()
+
+        elevation_diff = elevation - self.elevations[-1]
+        if elevation_diff > 0:
+            self.total_ascent += elevation_diff
+        else:
+            self.total_descent -= elevation_diff
+
+        if time_diff > PAUSE_THRESHOLD_SECONDS:
+            return  # Skip this segment if the pause is significant
+
+        speed = (distance / time_diff) * 3.6
+        self.total_distance += distance
+        self.total_time_seconds += time_diff
+        if speed >= MOVING_SPEED:
+            self.moving_time_seconds += time_diff
+
+        # Running mean over the last few speeds, the trailing counterpart of smooth_speed_data
+        self.recent_speeds.append(speed)
+        smoothed_speed = sum(self.recent_speeds) / len(self.recent_speeds)
+        self.highest_speed = max(self.highest_speed, smoothed_speed)
+        self.smoothed_speeds.append(smoothed_speed)
+        self.distances_kilometers.append(self.total_distance / 1000)
+        self.profile_elevations.append(elevation)
+
+    @property
+    def metrics(self):
+        return {
+            'total_distance': self.total_distance / 1000,  # Convert to km
+            'total_time_seconds': self.total_time_seconds,
+            'moving_time_seconds': self.moving_time_seconds,
+            'current_speed': self.smoothed_speeds[-1] if self.smoothed_speeds else 0,
+            'highest_speed': self.highest_speed,
+            'average_speed': self.total_distance / self.moving_time_seconds * 3.6 if self.moving_time_seconds else 0,
+            'total_ascent': self.total_ascent,
+            'total_descent': self.total_descent,
+        }
+
+    # New map points and profile points since the given counts, used for extendData updates
+    def points_since(self, map_count, profile_count):
+        with self.lock:
+            return {
+                'latitudes': self.latitudes[map_count:],
+                'longitudes': self.longitudes[map_count:],
+                'distances_kilometers': self.distances_kilometers[profile_count:],
+                'elevations': self.profile_elevations[profile_count:],
+                'smoothed_speeds': self.smoothed_speeds[profile_count:],
+                'map_count': len(self.latitudes),
+                'profile_count': len(self.distances_kilometers),
+                'metrics': self.metrics,
+            }
+
+# Follow a GPX file that is still being written and feed new points to a live track
+class GpxFollower:
+    def __init__(self, file_path, track):
+        self.file_path = file_path
+        self.track = track
+        self.offset = 0
+        self.lock = threading.Lock()
+
+    def poll(self):
+        try:
+            size = os.path.getsize(self.file_path)
+        except FileNotFoundError:
+            return 0
+        with self.lock:
+            if size < self.offset:
+                self.offset = 0  # The file was truncated or replaced
+            with open(self.file_path, 'rb') as gpx_file:
+                gpx_file.seek(self.offset)
+                content = gpx_file.read().decode('utf-8', errors='replace')
+
+            added = 0
+            end = 0
+            for match in trkpt_regex.finditer(content):
+                end = match.end()
+                time_match = time_regex.search(match.group(3))
+                if not time_match:
+                    continue
+                ele_match = ele_regex.search(match.group(3))
+                elevation = float(ele_match.group(1)) if ele_match else None
+                if self.track.add_point(float(match.group(1)), float(match.group(2)), time_match.group(1), elevation):
+                    added += 1
+
+            # Continue after the last complete point, recorders rewrite the closing tags behind it with every new point
+            self.offset += len(content[:end].encode('utf-8'))
+            return added
+
+# Live tracks fed over HTTP by id and followed GPX files by path
+live_tracks = {}
+live_followers = {}
+live_lock = threading.Lock()
+
+# Drop tracks and followers that have not received new points for a while
+def expire_live_tracks():
+    expired = clock.time() - LIVE_TRACK_EXPIRY
+    for track_id in [track_id for track_id, track in live_tracks.items() if track.updated < expired]:
+        del live_tracks[track_id]
+    for file_path in [file_path for file_path, follower in live_followers.items() if follower.track.updated < expired]:
+        del live_followers[file_path]
+
+# Existing live track, or a new one for points received over HTTP, None if the id is invalid or the limit is reached
+def get_live_track(track_id, create=False):
+    with live_lock:
+        expire_live_tracks()
+        if track_id not in live_tracks:
+            if not create or not track_id_regex.match(track_id) or len(live_tracks) >= MAX_LIVE_TRACKS:
+                return None
+            live_tracks[track_id] = LiveTrack()
+        return live_tracks[track_id]
+
+# Follow a GPX file inside the live folder, None for any other path or when the limit is reached
+def follow_gpx(file_path, folder):
+    folder = os.path.abspath(folder)
+    file_path = os.path.abspath(file_path)
+    if os.path.commonpath([folder, file_path]) != folder or not os.path.isfile(file_path):
+        return None
+
+    with live_lock:
+        expire_live_tracks()
+        if file_path not in live_followers:
+            if len(live_followers) >= MAX_LIVE_TRACKS:
+                return None
+            live_followers[file_path] = GpxFollower(file_path, LiveTrack())
+        follower = live_followers[file_path]
+    follower.poll()
+    return follower.track
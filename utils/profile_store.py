@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+# Location of the local profile store, can be overridden for deployments
+store_path = os.environ.get(
+    'PROFILE_STORE_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'profiles.db')
+)
+
+# Accepted ranges of the personal information
+profile_limits = {
+    'weight': (20, 300),
+    'height': (100, 250),
+    'age': (5, 120),
+}
+profile_sexes = ['Male', 'Female']
+
+def connect():
+    connection = sqlite3.connect(store_path, timeout=10)
+    connection.execute('CREATE TABLE IF NOT EXISTS profiles (profile_hash TEXT PRIMARY KEY, profile TEXT NOT NULL)')
+    connection.execute('CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, profile_hash TEXT NOT NULL)')
+    return connection
+
+# Validate the personal information, returns the profile and a list of errors
+def validate_profile(weight, height, age, sex):
+    errors = []
+    profile = {}
+
+    for name, value in [('weight', weight), ('height', height), ('age', age)]:
+        low, high = profile_limits[name]
+        if value is None or value == '':
+            errors.append(f'Please enter your {name}.')
+            continue
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            errors.append(f'Your {name} must be a number.')
+            continue
+        if not low <= value <= high:
+            errors.append(f'Your {name} must be between {low} and {high}.')
+            continue
+        profile[name] = int(value) if name == 'age' else value
+
+    if sex not in profile_sexes:
+        errors.append('Please select your sex.')
+    else:
+        profile['sex'] = sex
+
+    return (None, errors) if errors else (profile, errors)
+
+# Compact hash of the profile, usable as a cache key
+def hash_profile(profile):
+    canonical = json.dumps(profile, sort_keys=True)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:12]
+
+def save_profile(session_id, profile):
+    profile_hash = hash_profile(profile)
+    with connect() as connection:
+        connection.execute('INSERT OR IGNORE INTO profiles VALUES (?, ?)', (profile_hash, json.dumps(profile, sort_keys=True)))
+        connection.execute('INSERT OR REPLACE INTO sessions VALUES (?, ?)', (session_id, profile_hash))
+    connection.close()
+    return profile_hash
+
+def load_profile(profile_hash):
+    if not profile_hash:
+        return None
+    connection = connect()
+    row = connection.execute('SELECT profile FROM profiles WHERE profile_hash = ?', (profile_hash,)).fetchone()
+    connection.close()
+    return json.loads(row[0]) if row else None
+
+def load_session_profile(session_id):
+    if not session_id:
+        return None, None
+    connection = connect()
+    row = connection.execute(
+        'SELECT p.profile_hash, p.profile FROM sessions s JOIN profiles p ON p.profile_hash = s.profile_hash WHERE s.session_id = ?',
+        (session_id,)
+    ).fetchone()
+    connection.close()
+    return (row[0], json.loads(row[1])) if row else (None, None)
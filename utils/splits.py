@@ -0,0 +1,74 @@
+import numpy as np
+
+# Distances (m) and durations (s) of the best efforts
+BEST_DISTANCES = [1000, 5000, 10000]
+BEST_DURATIONS = [5 * 60, 20 * 60, 60 * 60]
+
+# Time of every full kilometre and the remaining partial one, from cumulative distance (m) and time (s)
+def calculate_splits(distances, elapsed, split_distance=1000):
+    if len(distances) < 2:
+        return []
+
+    boundaries = np.arange(split_distance, distances[-1], split_distance)
+    boundaries = np.append(boundaries, distances[-1])
+    boundary_times = np.interp(boundaries, distances, elapsed)
+    split_lengths = np.diff(boundaries, prepend=0.0)
+    split_times = np.diff(boundary_times, prepend=0.0)
+
+    return [
+        {
+            'distance': float(boundary) / 1000,
+            'length': float(length) / 1000,
+            'time': float(time),
+            'speed': float(length / time * 3.6) if time > 0 else 0.0,
+        }
+        for boundary, length, time in zip(boundaries, split_lengths, split_times)
+        if length > 0
+    ]
+
+# Shortest time to cover the given distance. Between samples the window duration changes linearly, so the
+# best window starts or ends on a sample point: both sets of windows are checked with one vectorized
+# np.interp search each (O(n log n)), which is faster in numpy than a Python two-pointer loop.
+def best_distance_effort(distances, elapsed, target_distance):
+    if len(distances) < 2 or distances[-1] < target_distance:
+        return None
+    ends = distances >= target_distance
+    start_times = np.interp(distances[ends] - target_distance, distances, elapsed)
+    starts = distances <= distances[-1] - target_distance
+    end_times = np.interp(distances[starts] + target_distance, distances, elapsed)
+    return float(min((elapsed[ends] - start_times).min(), (end_times - elapsed[starts]).min()))
+
+# Longest distance covered within the given duration, the same search over the cumulative times
+def best_duration_effort(distances, elapsed, target_duration):
+    if len(elapsed) < 2 or elapsed[-1] < target_duration:
+        return None
+    ends = elapsed >= target_duration
+    start_distances = np.interp(elapsed[ends] - target_duration, elapsed, distances)
+    starts = elapsed <= elapsed[-1] - target_duration
+    end_distances = np.interp(elapsed[starts] + target_duration, elapsed, distances)
+    return float(max((distances[ends] - start_distances).max(), (end_distances - distances[starts]).max()))
+
+def calculate_efforts(data):
+    # The cumulative arrays start after the first segment, the track itself starts at zero distance and time
+    distances = np.concatenate([[0.0], np.asarray(data['distances_array'], dtype=float)])
+    elapsed = np.concatenate([[0.0], np.asarray(data['elapsed_seconds'], dtype=float)])
+    return {
+        'splits': calculate_splits(distances, elapsed),
+        'distances': {target: best_distance_effort(distances, elapsed, target) for target in BEST_DISTANCES},
+        'durations': {target: best_duration_effort(distances, elapsed, target) for target in BEST_DURATIONS},
+    }
+
+# Best efforts over several activities, the fastest time per distance and the longest distance per duration
+def personal_records(efforts_list):
+    records = {
+        'distances': {target: None for target in BEST_DISTANCES},
+        'durations': {target: None for target in BEST_DURATIONS},
+    }
+    for efforts in efforts_list:
+        for target, time in efforts['distances'].items():
+            if time is not None and (records['distances'][target] is None or time < records['distances'][target]):
+                records['distances'][target] = time
+        for target, distance in efforts['durations'].items():
+            if distance is not None and (records['durations'][target] is None or distance > records['durations'][target]):
+                records['durations'][target] = distance
+    return records
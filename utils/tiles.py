@@ -0,0 +1,190 @@
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from flask import Response, abort, has_request_context, request
+
+# Where the tiles come from and where they are cached, can be overridden for deployments
+tile_upstream = os.environ.get('TILE_UPSTREAM', 'https://tile.openstreetmap.org/{z}/{x}/{y}.png')
+tile_folder = os.environ.get(
+    'TILE_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tiles')
+)
+tile_cache_max_bytes = int(float(os.environ.get('TILE_CACHE_MAX_MB', 500)) * 1024 * 1024)
+# Highest zoom level that is served or requested from the upstream
+tile_max_zoom = int(os.environ.get('TILE_MAX_ZOOM', 19))
+# The OSM tile usage policy forbids bulk prefetching from the public servers,
+# so tracks are only pre-seeded from an explicitly configured upstream that is not OSM
+seeding_enabled = 'TILE_UPSTREAM' in os.environ and 'tile.openstreetmap.org' not in tile_upstream
+
+# Zoom levels pre-seeded for every track and the maximum number of tiles seeded per track
+SEED_ZOOMS = range(8, 16)
+SEED_MAX_TILES = 3000
+SEED_WORKERS = 4
+
+# Every worker only counts its own fetches, so the real size on disk is measured again
+# after each worker has fetched this fraction of the size budget
+SIZE_CHECK_FRACTION = 0.01
+
+# How long browsers may keep the served tiles (s)
+TILE_MAX_AGE = 7 * 24 * 3600
+
+# Slippy map tile containing the given position
+def tile_xy(latitude, longitude, zoom):
+    n = 2 ** zoom
+    latitude = max(min(latitude, 85.0511), -85.0511)
+    x = int((longitude + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+# All tiles covering the bounding box at the given zoom levels
+def tiles_for_bounds(min_lat, min_lon, max_lat, max_lon, zooms=SEED_ZOOMS):
+    tiles = []
+    for zoom in zooms:
+        min_x, min_y = tile_xy(max_lat, min_lon, zoom)
+        max_x, max_y = tile_xy(min_lat, max_lon, zoom)
+        tiles += [(zoom, x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+    return tiles
+
+# Tiles stored on disk, the least recently used ones are evicted when the size budget is exceeded
+class TileCache:
+    def __init__(self, folder, upstream, max_bytes):
+        self.folder = folder
+        self.upstream = upstream
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = 'sport-monitoring tile cache'
+        self.size = self.disk_size()
+        self.unmeasured_bytes = 0
+
+    # Size of all tiles on disk, including the ones fetched by other workers
+    def disk_size(self):
+        size = 0
+        for root, _, names in os.walk(self.folder):
+            for name in names:
+                try:
+                    size += os.path.getsize(os.path.join(root, name))
+                except FileNotFoundError:
+                    pass  # Evicted by another worker
+        return size
+
+    def tile_path(self, zoom, x, y):
+        return os.path.join(self.folder, str(zoom), str(x), f'{y}.png')
+
+    def get(self, zoom, x, y):
+        path = self.tile_path(zoom, x, y)
+        try:
+            os.utime(path)  # Mark the tile as recently used
+            with open(path, 'rb') as tile_file:
+                return tile_file.read()
+        except FileNotFoundError:
+            return self.fetch(zoom, x, y)
+
+    def fetch(self, zoom, x, y):
+        try:
+            response = self.session.get(self.upstream.format(z=zoom, x=x, y=y), timeout=10)
+        except requests.RequestException:
+            return None  # Offline and not cached
+        if response.status_code != 200:
+            return None
+
+        path = self.tile_path(zoom, x, y)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as tile_file:
+            tile_file.write(response.content)
+        os.replace(temp_path, path)
+
+        with self.lock:
+            self.size += len(response.content)
+            self.unmeasured_bytes += len(response.content)
+            if self.unmeasured_bytes >= self.max_bytes * SIZE_CHECK_FRACTION:
+                self.size = self.disk_size()
+                self.unmeasured_bytes = 0
+            if self.size > self.max_bytes:
+                self.evict()
+        return response.content
+
+    # Remove the least recently used tiles until the cache is below 90 % of its budget
+    def evict(self):
+        files = []
+        for root, _, names in os.walk(self.folder):
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue  # Tile that is still being written
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue  # Already evicted by another worker
+                files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+
+        self.size = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if self.size <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # Already evicted by another worker
+            self.size -= size
+
+    def seed(self, tiles):
+        missing = [tile for tile in tiles if not os.path.exists(self.tile_path(*tile))]
+        with ThreadPoolExecutor(max_workers=SEED_WORKERS) as executor:
+            list(executor.map(lambda tile: self.fetch(*tile), missing))
+
+tile_cache = TileCache(tile_folder, tile_upstream, tile_cache_max_bytes)
+seeded_bounds = set()
+
+# Pre-seed the tiles of a track in the background so the map also works offline
+def seed_track_tiles(latitudes, longitudes, zooms=SEED_ZOOMS):
+    if not seeding_enabled or len(latitudes) == 0:
+        return
+    bounds = (min(latitudes), min(longitudes), max(latitudes), max(longitudes))
+    if bounds in seeded_bounds:
+        return
+    seeded_bounds.add(bounds)
+
+    # Drop the highest zoom levels for very large tracks to stay within the seeding limit
+    zooms = list(zooms)
+    tiles = tiles_for_bounds(*bounds, zooms)
+    while len(tiles) > SEED_MAX_TILES and len(zooms) > 1:
+        zooms.pop()
+        tiles = tiles_for_bounds(*bounds, zooms)
+
+    threading.Thread(target=tile_cache.seed, args=(tiles,), daemon=True).start()
+
+def register_tile_routes(server):
+    @server.route('/tiles/<int:zoom>/<int:x>/<int:y>.png')
+    def serve_tile(zoom, x, y):
+        if zoom > tile_max_zoom:
+            abort(404)
+        if not 0 <= x < 2 ** zoom or not 0 <= y < 2 ** zoom:
+            abort(404)
+        tile = tile_cache.get(zoom, x, y)
+        if tile is None:
+            abort(404)
+        response = Response(tile, mimetype='image/png')
+        response.headers['Cache-Control'] = f'public, max-age={TILE_MAX_AGE}'
+        return response
+
+# Map layout that draws the tiles from the local tile server instead of the public OSM servers,
+# static exports that are opened without the server pass the upstream tile URL instead
+def tile_layout(source=None):
+    if source is None:
+        base_url = request.host_url.rstrip('/') if has_request_context() else ''
+        source = f'{base_url}/tiles/{{z}}/{{x}}/{{y}}.png'
+    return dict(
+        mapbox_style='white-bg',
+        mapbox_layers=[{
+            'below': 'traces',
+            'sourcetype': 'raster',
+            'sourceattribution': '© OpenStreetMap contributors',
+            'source': [source],
+        }],
+    )
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+
+from utils.cleaning import cleaning_config
+
+# Shared on-disk cache of parsed tracks, so all workers on the host can reuse each other's work
+cache_folder = os.environ.get(
+    'TRACK_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache')
+)
+
+# Bump when the structure of the cached track data changes
+CACHE_VERSION = 3
+
+# Fields that are kept as Python objects, everything else is stored as a memory-mapped array
+object_fields = ['times', 'metrics']
+
+def path_hash(file_path):
+    return hashlib.sha1(file_path.encode('utf-8')).hexdigest()[:16]
+
+# The key changes whenever the GPX file or the cleaning settings are modified, it starts with a hash
+# of the path so the outdated entries of the same file can be found and removed
+def track_key(file_path):
+    file_path = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+    version = f'{stat.st_mtime_ns}:{stat.st_size}:{CACHE_VERSION}:{cleaning_config()}'
+    return f'{path_hash(file_path)}-{hashlib.sha1(version.encode("utf-8")).hexdigest()}'
+
+# Remove the entries of older versions of the same file and the ones from before the path prefix was added,
+# workers that still map them keep reading the arrays until they are closed
+def remove_outdated(key):
+    prefix = key.split('-')[0] + '-'
+    for name in os.listdir(cache_folder):
+        if '.' in name or name == key:
+            continue  # Track that is still being written or the current one
+        if name.startswith(prefix) or '-' not in name:
+            shutil.rmtree(os.path.join(cache_folder, name), ignore_errors=True)
+
+def load_track(key):
+    folder = os.path.join(cache_folder, key)
+    try:
+        with open(os.path.join(folder, 'fields.json'), 'r') as fields_file:
+            fields = json.load(fields_file)
+        with open(os.path.join(folder, 'objects.pkl'), 'rb') as objects_file:
+            data = pickle.load(objects_file)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError, json.JSONDecodeError):
+        return None
+
+    # Memory-mapped arrays are shared through the page cache instead of copied into every worker
+    for field in fields:
+        data[field] = np.load(os.path.join(folder, f'{field}.npy'), mmap_mode='r')
+    return data
+
+def save_track(key, data):
+    os.makedirs(cache_folder, exist_ok=True)
+    folder = os.path.join(cache_folder, key)
+    if os.path.isdir(folder):
+        return
+
+    # Write into a temporary folder and rename it, so other workers never see a partial track
+    temp_folder = tempfile.mkdtemp(dir=cache_folder, prefix=f'{key}.')
+    fields = [field for field in data if field not in object_fields]
+    for field in fields:
+        np.save(os.path.join(temp_folder, f'{field}.npy'), np.asarray(data[field], dtype=float))
+    with open(os.path.join(temp_folder, 'objects.pkl'), 'wb') as objects_file:
+        pickle.dump({field: data[field] for field in object_fields}, objects_file)
+    with open(os.path.join(temp_folder, 'fields.json'), 'w') as fields_file:
+        json.dump(fields, fields_file)
+
+    try:
+        os.rename(temp_folder, folder)
+    except OSError:
+        shutil.rmtree(temp_folder, ignore_errors=True)  # Another worker saved it first
+    remove_outdated(key)
+
+def load_or_create_track(file_path, create):
+    key = track_key(file_path)
+    data = load_track(key)
+    if data is None:
+        data = create(file_path)
+        save_track(key, data)
+        # Return the memory-mapped arrays like a warm load, so the callers always get the same types
+        data = load_track(key) or data
+    return data
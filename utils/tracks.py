@@ -0,0 +1,262 @@
+import gpxpy
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from utils.cleaning import clean_track
+from utils.geo import haversine
+from utils.tiles import tile_layout
+
+# Track loading and figures shared by the overview page and the batch export, without any app state
+
+# Function to parse GPX file
+def parse_gpx(file_path):
+    with open(file_path, 'r') as gpx_file:
+        gpx = gpxpy.parse(gpx_file)
+    
+    latitudes = []
+    longitudes = []
+    times = []
+    elevations = []
+    
+    for track in gpx.tracks:
+        for segment in track.segments:
+            for point in segment.points:
+                latitudes.append(point.latitude)
+                longitudes.append(point.longitude)
+                times.append(point.time)
+                elevations.append(point.elevation)
+    
+    return latitudes, longitudes, times, elevations
+
+# Smooth speed data using rolling average
+def smooth_speed_data(speeds, window_size=5):
+    speed_series = pd.Series(speeds)
+    smoothed_speeds = speed_series.rolling(window=window_size, center=True).mean().fillna(method='bfill').fillna(method='ffill')
+    return smoothed_speeds.tolist()
+
+def calculate_metrics(latitudes, longitudes, times, elevations, pause_threshold_minutes=1):
+    speeds = []
+    distances = []
+    elapsed_times = []
+    elevation_changes = []
+    total_distance = 0
+    total_time_seconds = 0
+    
+    pause_threshold_seconds = pause_threshold_minutes * 60
+    
+    for i in range(1, len(times)):
+        lat1, lon1, time1, ele1 = latitudes[i-1], longitudes[i-1], times[i-1], elevations[i-1]
+        lat2, lon2, time2, ele2 = latitudes[i], longitudes[i], times[i], elevations[i]
+        
+        distance = haversine(lat1, lon1, lat2, lon2)
+        time_diff = (time2 - time1).total_seconds()
+        
+        if time_diff > pause_threshold_seconds:
+            continue  # Skip this segment if the pause is significant
+        
+        if time_diff > 0:
+            speed = (distance / time_diff) * 3.6  # Convert to km/h
+        else:
+            speed = 0
+        
+        speeds.append(speed)
+        distances.append(total_distance + distance)
+        elapsed_times.append(total_time_seconds + time_diff)
+        elevation_changes.append(ele2 - ele1)
+        total_distance += distance
+        total_time_seconds += time_diff
+
+    smoothed_speeds = smooth_speed_data(speeds)
+
+    highest_speed = max(smoothed_speeds) if smoothed_speeds else 0
+    lowest_speed = min(smoothed_speeds) if smoothed_speeds else 0
+    average_speed = sum(smoothed_speeds) / len(smoothed_speeds) if smoothed_speeds else 0
+    top_elevation = max(elevations)
+    lowest_elevation = min(elevations)
+    
+    metrics = {
+        'highest_speed': highest_speed,
+        'lowest_speed': lowest_speed,
+        'average_speed': average_speed,
+        'total_time_seconds': total_time_seconds,
+        'top_elevation': top_elevation,
+        'lowest_elevation': lowest_elevation,
+        'total_distance': total_distance / 1000,  # Convert to km
+    }
+    
+    return speeds, distances, elapsed_times, elevation_changes, metrics
+
+def load_data(file_path):
+    # Parse GPX file and calculate metrics
+    latitudes, longitudes, times, elevations = parse_gpx(file_path)
+    # Remove GPS jumps and stationary jitter before calculating the metrics
+    latitudes, longitudes, times, elevations = clean_track(latitudes, longitudes, times, elevations)
+    speeds, distances, elapsed_times, elevation_changes, metrics = calculate_metrics(latitudes, longitudes, times, elevations)
+    distances_kilometers = [dist / 1000 for dist in distances]
+    smoothed_speeds = smooth_speed_data(speeds)
+    speeds_normalized = (np.array(speeds) - min(speeds)) / (max(speeds) - min(speeds))
+    
+    return {
+        'latitudes': latitudes,
+        'longitudes': longitudes,
+        'times': times,
+        'distances_kilometers': distances_kilometers,
+        'elevations': elevations,
+        'smoothed_speeds': smoothed_speeds,
+        'speeds_normalized': speeds_normalized,
+        # Cumulative distance (m) and moving time (s) arrays used for track comparison
+        'distances_array': np.asarray(distances, dtype=float),
+        'elapsed_seconds': np.asarray(elapsed_times, dtype=float),
+        'elevation_changes': np.asarray(elevation_changes, dtype=float),
+        'metrics': metrics
+    }
+
+def format_time(total_seconds):
+    hours, minutes, seconds = int(total_seconds // 3600), int((total_seconds % 3600) // 60), int(total_seconds % 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02}"
+
+# Most points drawn per compared track, more are not visible in the small profile graphs
+OVERLAY_MAX_POINTS = 2000
+
+# Sample the compared tracks onto the distance grid of the reference track and compute the time gap,
+# the grid is thinned to OVERLAY_MAX_POINTS so long tracks stay light in the browser
+def align_compared_tracks(reference, compared, max_points=OVERLAY_MAX_POINTS):
+    ref_distances = np.asarray(reference['distances_array'], dtype=float)
+    ref_elapsed = np.asarray(reference['elapsed_seconds'], dtype=float)
+    aligned = []
+
+    for data in compared:
+        distances = np.asarray(data['distances_array'], dtype=float)
+        elapsed = np.asarray(data['elapsed_seconds'], dtype=float)
+        if len(distances) < 2 or len(ref_distances) == 0:
+            aligned.append({'distances_kilometers': np.array([]), 'elevations': np.array([]), 'smoothed_speeds': np.array([]), 'gaps': np.array([])})
+            continue
+
+        # Only compare over the distance covered by both tracks
+        grid = np.flatnonzero(ref_distances <= distances[-1])
+        if len(grid) > max_points:
+            grid = grid[np.linspace(0, len(grid) - 1, max_points).astype(int)]
+        grid_distances = ref_distances[grid]
+
+        # Elevations are paired with the cumulative distances by index, as in the reference profile
+        elevations = np.asarray(data['elevations'], dtype=float)[:len(distances)]
+        aligned.append({
+            'distances_kilometers': grid_distances / 1000,
+            'elevations': np.interp(grid_distances, distances[:len(elevations)], elevations),
+            'smoothed_speeds': np.interp(grid_distances, distances, np.asarray(data['smoothed_speeds'], dtype=float)),
+            # Positive gap means the reference track is ahead of the compared track
+            'gaps': np.interp(grid_distances, distances, elapsed) - ref_elapsed[grid],
+        })
+
+    return aligned
+
+def create_map_figure(data, layout=None):
+    times = data['times']
+    formatted_times = [time.strftime('%Y-%m-%d %H:%M:%S %Z').replace(' Z', '') for time in times]  # Convert datetime to string
+    # Combine speed and time for hover info
+    hover_texts = [
+        f"Speed: {speed:.2f} km/h<br>Time: {time}"
+        for speed, time in zip(data['smoothed_speeds'], formatted_times)
+    ]
+
+    map_fig = go.Figure(go.Scattermapbox(
+        lat=data['latitudes'][1:],
+        lon=data['longitudes'][1:],
+        mode='markers+lines',
+        marker=dict(size=7, color=data['speeds_normalized'], colorscale='turbo'),
+        line=dict(width=2, color='blue'),
+        text=hover_texts,
+        hoverinfo='text'
+    ))
+
+    map_fig.update_layout(
+        **(layout or tile_layout()),
+        mapbox=dict(
+            center=go.layout.mapbox.Center(
+                lat=data['latitudes'][len(data['latitudes']) // 2],
+                lon=data['longitudes'][len(data['longitudes']) // 2]
+            ),
+            zoom=10
+        ),
+        margin={"r":0, "t":0, "l":0, "b":0}
+    )
+
+    return map_fig
+
+# Colors used for the compared tracks ("virtual partners")
+compare_colors = ['blue', 'orange', 'purple', 'brown', 'magenta', 'teal']
+
+# Profiles of the track, the compared tracks are (name, data) pairs drawn with their time gaps
+def create_combined_figure(data, compared=None):
+    # Create the combined figure with elevation and speed profiles
+    elev_fig = go.Scatter(
+        x=np.asarray(data['distances_kilometers']),
+        y=np.asarray(data['elevations']),
+        mode='lines+markers',
+        line=dict(color='green'),
+        marker=dict(size=5, color='green'),
+        text=[f'Elevation: {ele:.2f} m' for ele in data['elevations']],
+        hoverinfo='text'
+    )
+
+    speed_fig = go.Scatter(
+        x=np.asarray(data['distances_kilometers']),
+        y=np.asarray(data['smoothed_speeds']),
+        mode='lines+markers',
+        line=dict(color='red'),
+        marker=dict(size=5, color='red'),
+        text=[f'Speed: {speed:.2f} km/h' for speed in data['smoothed_speeds']],
+        hoverinfo='text'
+    )
+
+    compared = compared or []
+    rows = 3 if compared else 2
+    combined_fig = make_subplots(rows=rows, cols=1, shared_xaxes=True, vertical_spacing=0.1)
+    combined_fig.add_trace(elev_fig, row=1, col=1)
+    combined_fig.add_trace(speed_fig, row=2, col=1)
+
+    if compared:
+        aligned = align_compared_tracks(data, [compared_data for _, compared_data in compared])
+
+        for i, ((name, _), overlay) in enumerate(zip(compared, aligned)):
+            color = compare_colors[i % len(compare_colors)]
+            # WebGL traces keep the overlays interactive for long tracks
+            combined_fig.add_trace(go.Scattergl(
+                x=overlay['distances_kilometers'],
+                y=overlay['elevations'],
+                mode='lines',
+                name=name,
+                line=dict(color=color, width=1),
+                hovertemplate=f'{name}<br>Elevation: %{{y:.2f}} m<extra></extra>'
+            ), row=1, col=1)
+            combined_fig.add_trace(go.Scattergl(
+                x=overlay['distances_kilometers'],
+                y=overlay['smoothed_speeds'],
+                mode='lines',
+                name=name,
+                line=dict(color=color, width=1),
+                hovertemplate=f'{name}<br>Speed: %{{y:.2f}} km/h<extra></extra>'
+            ), row=2, col=1)
+            combined_fig.add_trace(go.Scattergl(
+                x=overlay['distances_kilometers'],
+                y=overlay['gaps'],
+                mode='lines',
+                name=name,
+                line=dict(color=color),
+                hovertemplate=f'{name}<br>Gap: %{{y:.0f}} s<extra></extra>'
+            ), row=3, col=1)
+
+        combined_fig.update_layout(yaxis3_title='Gap (s)')
+
+    combined_fig.update_layout(
+        xaxis=dict(range=[min(data['distances_kilometers']), max(data['distances_kilometers'])]),
+        xaxis_title='Distance (km)',
+        yaxis1_title='Elevation (m)',
+        yaxis2_title='Speed (km/h)',
+        showlegend=False,
+        margin={"r":0, "t":0, "l":0, "b":0}
+    )
+
+    return combined_fig
@@ -0,0 +1,29 @@
+import os
+import re
+
+from flask import has_request_context, request
+
+# With DATA_ROOT set, every user gets their own GPX folder DATA_ROOT/<user>
+data_root = os.environ.get('DATA_ROOT')
+# Header with the user name, set by the authenticating reverse proxy
+user_header = os.environ.get('USER_HEADER', 'X-Forwarded-User')
+
+def current_user():
+    if not has_request_context():
+        return 'default'
+    user = request.headers.get(user_header) or 'default'
+    # Only keep characters that are safe in a folder name
+    return re.sub(r'[^A-Za-z0-9_.@-]', '_', user).lstrip('.') or 'default'
+
+def get_data_folder(default_folder):
+    if not data_root:
+        return default_folder
+    folder = os.path.join(data_root, current_user())
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+# Users may only open files inside their own data folder
+def is_user_file(file_path, default_folder):
+    folder = os.path.abspath(get_data_folder(default_folder))
+    file_path = os.path.abspath(file_path)
+    return os.path.commonpath([folder, file_path]) == folder and os.path.isfile(file_path)
@@ -0,0 +1,6 @@
+# Production entry point, run with: gunicorn -c gunicorn.conf.py wsgi:server
+from werkzeug.middleware.proxy_fix import ProxyFix
+from index import server
+
+# Behind the reverse proxy, use its scheme and host for generated URLs such as the map tiles
+server.wsgi_app = ProxyFix(server.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)